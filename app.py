@@ -14,18 +14,36 @@ Last Updated: October 2025
 Version: 2.2 (Final - Clean Design)
 """
 
+import time
+_SCRIPT_START = time.perf_counter()
+
+import os
+import sys
+import importlib
 import streamlit as st
 import pandas as pd
 import numpy as np
-import plotly.graph_objects as go
-import plotly.express as px
 from datetime import datetime, timedelta
 import warnings
-from scipy import stats
-from io import BytesIO
+
+from data_cache import (
+    APPROXIMATE_STATS, DEFAULT_DATASET, approximate_statistics, cache, current_version, dashboard_results,
+    dataset_totals, get_query_backend, opponent_ratings, record_usage, registry, rejected_versions, sort_order,
+    start_warmer, startup_profile
+)
+from data_quality import ISSUE_TYPES, DataQualityError
+from injury_data import (
+    DEFAULT_EXPORT_COLUMNS, EXPORT_FORMATS, FEATURES, SEVERITY_LEVELS,
+    FilterState, export_bytes
+)
 
 warnings.filterwarnings('ignore')
 
+# Heavy libraries (plotly, openpyxl) are imported lazily by the sections that
+# need them, so the header, sidebar and KPIs paint before they are loaded.
+# Set INJURY_DASHBOARD_PROFILE_STARTUP=1 to show per-module import costs.
+PROFILE_STARTUP = os.environ.get("INJURY_DASHBOARD_PROFILE_STARTUP", "0") == "1"
+
 # ============================================================================
 # PAGE CONFIGURATION & THEMING
 # ============================================================================
@@ -44,6 +62,31 @@ DANGER_COLOR = "#d62728"
 WARNING_COLOR = "#ff9896"
 INFO_COLOR = "#17becf"
 
+# ============================================================================
+# DEFERRED IMPORTS & STARTUP PROFILING
+# ============================================================================
+def lazy_import(module_name):
+    """
+    Import a module the first time a section needs it and record the cost.
+    """
+    if module_name in sys.modules:
+        # Not sys.modules[...]: import_module waits while another session's
+        # thread is still initialising the module
+        return importlib.import_module(module_name)
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    startup_profile["imports"][module_name] = time.perf_counter() - start
+    return module
+
+
+def mark_startup(checkpoint):
+    """
+    Record the time elapsed since the script started at a named checkpoint.
+    """
+    if PROFILE_STARTUP:
+        startup_profile["checkpoints"][checkpoint] = time.perf_counter() - _SCRIPT_START
+
+
 # ============================================================================
 # PROFESSIONAL MINIMALIST STYLING - CLEAN DESIGN
 # ============================================================================
@@ -158,123 +201,55 @@ st.markdown(f"""
 # ============================================================================
 # DATA LOADING & ADVANCED PREPROCESSING
 # ============================================================================
-@st.cache_data
-def load_and_preprocess_data():
+# Cached loaders live in data_cache so the background warmer (started here, or
+# at server boot by serve.py) fills the same cache entries sessions read.
+start_warmer()
+
+FILTER_WIDGET_KEYS = ["teams_filter", "seasons_filter", "severity_filter", "position_filter", "age_filter",
+                      "date_range_filter", "rating_range_filter", "age_range_filter", "duration_range_filter"]
+
+
+def reset_filters():
     """
-    Advanced data preprocessing pipeline with comprehensive feature engineering.
+    Filter selections belong to one dataset; start from its defaults after a switch.
     """
-    try:
-        df = pd.read_csv('player_injuries_impact.csv')
-        
-        # Date processing
-        df['Date of Injury'] = pd.to_datetime(df['Date of Injury'], errors='coerce')
-        df['Date of return'] = pd.to_datetime(df['Date of return'], errors='coerce')
-        
-        df['Injury_Duration_Days'] = (df['Date of return'] - df['Date of Injury']).dt.days
-        df['Injury_Duration_Days'] = df['Injury_Duration_Days'].fillna(df['Injury_Duration_Days'].median())
-        
-        df['Injury_Month'] = df['Date of Injury'].dt.month
-        df['Injury_Year'] = df['Date of Injury'].dt.year
-        df['Injury_Month_Name'] = df['Date of Injury'].dt.strftime('%B')
-        df['Injury_Quarter'] = df['Date of Injury'].dt.quarter
-        df['Injury_Week'] = df['Date of Injury'].dt.isocalendar().week
-        
-        # Value cleaning
-        def clean_rating(val):
-            if val == 'N.A.' or pd.isna(val):
-                return np.nan
-            try:
-                return float(str(val).replace('(S)', '').replace('(A)', '').strip())
-            except:
-                return np.nan
-        
-        def clean_gd(val):
-            if val == 'N.A.' or pd.isna(val):
-                return np.nan
-            try:
-                return float(val)
-            except:
-                return np.nan
-        
-        rating_cols = [col for col in df.columns if 'Player_rating' in col]
-        for col in rating_cols:
-            df[col] = df[col].apply(clean_rating)
-        
-        gd_cols = [col for col in df.columns if '_GD' in col]
-        for col in gd_cols:
-            df[col] = df[col].apply(clean_gd)
-        
-        # Feature engineering
-        before_rating_cols = ['Match1_before_injury_Player_rating', 'Match2_before_injury_Player_rating', 'Match3_before_injury_Player_rating']
-        after_rating_cols = ['Match1_after_injury_Player_rating', 'Match2_after_injury_Player_rating', 'Match3_after_injury_Player_rating']
-        
-        df['Avg_Rating_Before_Injury'] = df[before_rating_cols].mean(axis=1)
-        df['Avg_Rating_After_Injury'] = df[after_rating_cols].mean(axis=1)
-        df['Performance_Drop_Index'] = df['Avg_Rating_Before_Injury'] - df['Avg_Rating_After_Injury']
-        df['Performance_Recovery_Rate'] = (df['Performance_Drop_Index'] / (df['Avg_Rating_Before_Injury'] + 0.001)) * 100
-        
-        missed_gd_cols = ['Match1_missed_match_GD', 'Match2_missed_match_GD', 'Match3_missed_match_GD']
-        before_gd_cols = ['Match1_before_injury_GD', 'Match2_before_injury_GD', 'Match3_before_injury_GD']
-        after_gd_cols = ['Match1_after_injury_GD', 'Match2_after_injury_GD', 'Match3_after_injury_GD']
-        
-        df['Avg_GD_Before'] = df[before_gd_cols].mean(axis=1)
-        df['Team_Performance_During_Absence'] = df[missed_gd_cols].mean(axis=1)
-        df['Avg_GD_After'] = df[after_gd_cols].mean(axis=1)
-        df['Team_Performance_Drop'] = df['Avg_GD_Before'] - df['Team_Performance_During_Absence']
-        
-        df['Win_Ratio_Before'] = (df['Match1_before_injury_Result'] == 'win').astype(int) + \
-                                 (df['Match2_before_injury_Result'] == 'win').astype(int) + \
-                                 (df['Match3_before_injury_Result'] == 'win').astype(int)
-        
-        df['Win_Ratio_During'] = (df['Match1_missed_match_Result'] == 'win').astype(int) + \
-                                 (df['Match2_missed_match_Result'] == 'win').astype(int) + \
-                                 (df['Match3_missed_match_Result'] == 'win').astype(int)
-        
-        # Injury severity
-        def categorize_severity(injury_type):
-            severe_keywords = ['cruciate', 'acl', 'meniscus', 'fracture', 'rupture', 'tear', 'ligament']
-            moderate_keywords = ['hamstring', 'groin', 'calf', 'shoulder', 'ankle', 'strain']
-            
-            injury_lower = str(injury_type).lower()
-            for keyword in severe_keywords:
-                if keyword in injury_lower:
-                    return 'Severe'
-            for keyword in moderate_keywords:
-                if keyword in injury_lower:
-                    return 'Moderate'
-            return 'Minor'
-        
-        df['Injury_Severity'] = df['Injury'].apply(categorize_severity)
-        
-        df['Recovery_Index'] = df['Injury_Duration_Days'] / 100
-        df['Team_Impact_Severity'] = abs(df['Team_Performance_Drop']) * np.where(df['Injury_Severity'] == 'Severe', 1.5,
-                                        np.where(df['Injury_Severity'] == 'Moderate', 1.0, 0.7))
-        
-        df['Age_Group'] = pd.cut(df['Age'], bins=[0, 23, 26, 29, 40], 
-                                 labels=['Young (≤23)', 'Prime (24-26)', 'Experienced (27-29)', 'Veteran (30+)'])
-        
-        df['Performance_Category'] = pd.cut(df['FIFA rating'], 
-                                           bins=[0, 75, 80, 85, 100],
-                                           labels=['Average', 'Good', 'Very Good', 'Elite'])
-        
-        # Missing value handling
-        numeric_cols = df.select_dtypes(include=[np.number]).columns
-        for col in numeric_cols:
-            df[col].fillna(df[col].median(), inplace=True)
-        
-        return df
-    
-    except Exception as e:
-        st.error(f"Error loading data: {str(e)}")
-        return None
+    for key in FILTER_WIDGET_KEYS:
+        st.session_state.pop(key, None)
+
+
+# Datasets are only loaded once a session selects them
+dataset_name = DEFAULT_DATASET
+if len(registry) > 1:
+    dataset_name = st.sidebar.selectbox(
+        "🗂️ Dataset",
+        options=list(registry),
+        key="dataset",
+        on_change=reset_filters
+    )
 
 # Load data
-df = load_and_preprocess_data()
+try:
+    # The published version: a changed file is swapped in by the background
+    # warmer once rebuilt, so this run never waits on a reload
+    version = current_version(dataset_name)
+    backend = get_query_backend(dataset_name, version)
+except DataQualityError as e:
+    st.error(str(e))
+    st.dataframe(e.report.sample_frame(), use_container_width=True, hide_index=True)
+    st.stop()
+except Exception as e:
+    st.error(f"Error loading data: {str(e)}")
+    backend = None
 
-if df is None:
-    st.error("Failed to load dataset. Please ensure 'player_injuries_impact.csv' is in the same directory.")
+if backend is None:
+    st.error(f"Failed to load dataset '{dataset_name}'. Please ensure "
+             f"'{registry[dataset_name].data_path}' exists.")
     st.stop()
 
+totals = dataset_totals(dataset_name, version)
+
+mark_startup("Data loaded")
+
 # ============================================================================
 # DASHBOARD HEADER
 # ============================================================================
@@ -289,33 +264,33 @@ st.sidebar.header("🔍 FILTER & CUSTOMIZE")
 with st.sidebar.expander("📋 Filter Options", expanded=True):
     selected_teams = st.multiselect(
         "🏆 Select Teams",
-        options=sorted(df['Team Name'].unique()),
-        default=sorted(df['Team Name'].unique()),
+        options=backend.options('Team Name'),
+        default=backend.options('Team Name'),
         key="teams_filter"
     )
     
     selected_seasons = st.multiselect(
         "📅 Select Seasons",
-        options=sorted(df['Season'].unique()),
-        default=sorted(df['Season'].unique()),
+        options=backend.options('Season'),
+        default=backend.options('Season'),
         key="seasons_filter"
     )
     
     selected_severity = st.multiselect(
         "🔴 Injury Severity",
-        options=['Minor', 'Moderate', 'Severe'],
-        default=['Minor', 'Moderate', 'Severe'],
+        options=SEVERITY_LEVELS,
+        default=SEVERITY_LEVELS,
         key="severity_filter"
     )
     
     selected_positions = st.multiselect(
         "👥 Player Position",
-        options=sorted(df['Position'].unique()),
-        default=sorted(df['Position'].unique()),
+        options=backend.options('Position'),
+        default=backend.options('Position'),
         key="position_filter"
     )
     
-    age_groups = sorted(df['Age_Group'].dropna().unique())
+    age_groups = backend.options('Age_Group')
     selected_age = st.multiselect(
         "👶 Age Group",
         options=age_groups,
@@ -323,21 +298,102 @@ with st.sidebar.expander("📋 Filter Options", expanded=True):
         key="age_filter"
     )
 
+# Range filters are answered by the backend (binary search over presorted
+# indexes, or SQL); only ranges narrower than the full extent are applied.
+active_ranges = {}
+
+
+def range_slider(label, column, key):
+    extent = backend.extent(column)
+    if extent is None or extent[0] == extent[1]:
+        return
+    low, high = int(np.floor(extent[0])), int(np.ceil(extent[1]))
+    selected = st.slider(label, min_value=low, max_value=high, value=(low, high), key=key)
+    if selected != (low, high):
+        active_ranges[column] = selected
+
+
+with st.sidebar.expander("📏 Range Filters", expanded=False):
+    injury_dates = backend.extent('Date of Injury')
+    if injury_dates is not None:
+        first_date = pd.Timestamp(injury_dates[0]).date()
+        last_date = pd.Timestamp(injury_dates[1]).date()
+        selected_dates = st.date_input(
+            "📆 Date of Injury",
+            value=(first_date, last_date),
+            min_value=first_date,
+            max_value=last_date,
+            key="date_range_filter"
+        )
+        if len(selected_dates) == 2 and tuple(selected_dates) != (first_date, last_date):
+            active_ranges['Date of Injury'] = (
+                pd.Timestamp(selected_dates[0]),
+                pd.Timestamp(selected_dates[1]) + pd.Timedelta(days=1) - pd.Timedelta(1, unit='ns')
+            )
+    
+    range_slider("⭐ FIFA Rating", 'FIFA rating', "rating_range_filter")
+    range_slider("🎂 Age", 'Age', "age_range_filter")
+    range_slider("⏳ Days Out", 'Injury_Duration_Days', "duration_range_filter")
+
+approximate = st.sidebar.checkbox(
+    "⚡ Approximate statistics",
+    value=APPROXIMATE_STATS,
+    key="approx_mode",
+    help="Use mergeable sketches for distinct counts, percentiles and correlations; "
+         "each estimate is shown with its error bound."
+)
+
+adjusted_gd = st.sidebar.checkbox(
+    "🧮 Opponent-adjusted GD",
+    value=False,
+    key="adjusted_gd",
+    help="Adjust every match GD for the opponent's strength (least-squares club ratings) "
+         "in the team performance drop charts."
+)
+
 # Apply filters
-df_filtered = df[
-    (df['Team Name'].isin(selected_teams)) &
-    (df['Season'].isin(selected_seasons)) &
-    (df['Injury_Severity'].isin(selected_severity)) &
-    (df['Position'].isin(selected_positions)) &
-    (df['Age_Group'].isin(selected_age))
-].copy()
+filter_state = FilterState(
+    teams=tuple(selected_teams),
+    seasons=tuple(selected_seasons),
+    severities=tuple(selected_severity),
+    positions=tuple(selected_positions),
+    age_groups=tuple(selected_age),
+    ranges=tuple((col, low, high) for col, (low, high) in active_ranges.items())
+)
+
+if st.session_state.get('_logged_filter_state') != (dataset_name, filter_state):
+    record_usage(dataset_name, filter_state)
+    st.session_state['_logged_filter_state'] = (dataset_name, filter_state)
+
+# Aggregates come from the per-filter-state cache (possibly pre-warmed);
+# the view is only used for row-level tables and charts.
+results = dashboard_results(dataset_name, version, filter_state, approximate)
+view = backend.view(filter_state)
+sketch_stats = None
+if approximate:
+    sketch_stats = approximate_statistics(dataset_name, version, filter_state)
+
+n_filtered = results['count']
+summary = results['summary']
+
+# Team performance drop figures, raw or opponent-adjusted
+adjusted_suffix = '_adjusted' if adjusted_gd else ''
+gd_label = "GD (opp.-adjusted)" if adjusted_gd else "GD"
+injury_impact = results['injury_impact' + adjusted_suffix]
+team_drop = results['team_drop' + adjusted_suffix]
 
 # Sidebar Statistics
 with st.sidebar.expander("📊 Quick Stats", expanded=True):
-    st.metric("Total Records", len(df_filtered), f"({len(df)} overall)")
-    st.metric("Unique Players", df_filtered['Name'].nunique(), f"({df['Name'].nunique()} total)")
-    st.metric("Teams Analyzed", df_filtered['Team Name'].nunique(), f"({df['Team Name'].nunique()} total)")
-    st.metric("Avg Injury Duration", f"{df_filtered['Injury_Duration_Days'].mean():.0f} days")
+    st.metric("Total Records", n_filtered, f"({totals['records']} overall)")
+    if sketch_stats is None:
+        st.metric("Unique Players", int(summary['players']), f"({totals['players']} total)")
+        st.metric("Teams Analyzed", int(summary['teams']), f"({totals['teams']} total)")
+    else:
+        for label, key in (("Unique Players", 'players'), ("Teams Analyzed", 'teams')):
+            estimate, bound = sketch_stats[key]
+            st.metric(f"{label} (≈)", f"{estimate:,.0f} ± {bound:,.0f}", f"({totals[key]} total)")
+    st.metric("Avg Injury Duration", f"{summary['avg_duration']:.0f} days")
+    st.caption(f"Query backend: {backend.name} | Data as of {datetime.fromtimestamp(version):%Y-%m-%d %H:%M:%S}")
 
 # ============================================================================
 # KEY METRICS DASHBOARD (TOP ROW)
@@ -350,14 +406,14 @@ col1, col2, col3, col4, col5, col6 = st.columns(6)
 with col1:
     st.metric(
         "Total Injuries",
-        len(df_filtered),
-        delta=f"{len(df) - len(df_filtered)} filtered",
+        n_filtered,
+        delta=f"{totals['records'] - n_filtered} filtered",
         delta_color="off"
     )
 
 with col2:
-    avg_duration = df_filtered['Injury_Duration_Days'].mean()
-    std_duration = df_filtered['Injury_Duration_Days'].std()
+    avg_duration = summary['avg_duration']
+    std_duration = summary['std_duration']
     st.metric(
         "Avg Recovery",
         f"{avg_duration:.0f} days",
@@ -366,7 +422,7 @@ with col2:
     )
 
 with col3:
-    avg_perf_drop = df_filtered['Performance_Drop_Index'].mean()
+    avg_perf_drop = summary['avg_perf_drop']
     st.metric(
         "Performance Drop",
         f"{avg_perf_drop:.2f}",
@@ -375,25 +431,26 @@ with col3:
     )
 
 with col4:
-    most_common = df_filtered['Injury'].value_counts().index[0] if len(df_filtered) > 0 else "N/A"
+    injury_counts = results['injury_counts']
+    most_common = injury_counts.index[0] if len(injury_counts) > 0 else "N/A"
     st.metric(
         "Most Common Injury",
         most_common[:15],
-        delta=f"{df_filtered['Injury'].value_counts().values[0]} cases" if len(df_filtered) > 0 else "N/A",
+        delta=f"{injury_counts.values[0]} cases" if len(injury_counts) > 0 else "N/A",
         delta_color="off"
     )
 
 with col5:
-    team_perf_drop = df_filtered['Team_Performance_Drop'].mean()
+    team_perf_drop = summary['avg_adj_team_drop' if adjusted_gd else 'avg_team_drop']
     st.metric(
         "Team Perf Drop",
         f"{team_perf_drop:.2f}",
-        delta="Goal Diff",
+        delta="Goal Diff (opp.-adj.)" if adjusted_gd else "Goal Diff",
         delta_color="inverse" if team_perf_drop > 0 else "normal"
     )
 
 with col6:
-    win_drop = (df_filtered['Win_Ratio_Before'].mean() - df_filtered['Win_Ratio_During'].mean())
+    win_drop = summary['avg_wins_before'] - summary['avg_wins_during']
     st.metric(
         "Win Rate Drop",
         f"{win_drop:.1f}",
@@ -402,10 +459,72 @@ with col6:
     )
 
 st.markdown("---")
+mark_startup("KPIs rendered")
+
+# ============================================================================
+# SERVER-SIDE PAGINATED TABLES
+# ============================================================================
+GRID_PAGE_SIZE = 15
+
+
+def paged_table(key, columns, default_sort, ascending=False, equals=None, formatters=None):
+    """
+    Table of the filtered rows where sorting, paging and projection happen on
+    the server. The sort order is computed once per filter state and sort
+    column and reused across page flips; only the visible page is fetched
+    and sent to the browser.
+    """
+    if not columns:
+        st.info("Select at least one column to preview.")
+        return
+    if st.session_state.get(f"{key}_sort") not in columns:
+        st.session_state.pop(f"{key}_sort", None)
+
+    col_sort, col_order, col_page = st.columns([2, 1, 1])
+    with col_sort:
+        sort_by = st.selectbox(
+            "Sort by",
+            options=columns,
+            index=columns.index(default_sort) if default_sort in columns else 0,
+            key=f"{key}_sort"
+        )
+    with col_order:
+        ascending = st.toggle("Ascending", value=ascending, key=f"{key}_ascending")
+
+    equals = tuple((equals or {}).items())
+    order = sort_order(dataset_name, version, filter_state, sort_by, ascending, equals)
+    n_pages = max(1, -(-len(order) // GRID_PAGE_SIZE))
+
+    # A new filter, sort or subject starts again from the first page
+    signature = (dataset_name, version, filter_state, sort_by, ascending, equals)
+    if st.session_state.get(f"{key}_signature") != signature or st.session_state.get(f"{key}_page", 1) > n_pages:
+        st.session_state[f"{key}_page"] = 1
+        st.session_state[f"{key}_signature"] = signature
+
+    with col_page:
+        page = st.number_input("Page", min_value=1, max_value=n_pages, step=1, key=f"{key}_page")
+
+    start = (page - 1) * GRID_PAGE_SIZE
+    page_rows = view.fetch(order[start:start + GRID_PAGE_SIZE], columns)
+    for col, formatter in (formatters or {}).items():
+        if col in page_rows.columns:
+            page_rows[col] = formatter(page_rows[col])
+    page_rows.index = pd.RangeIndex(start + 1, start + 1 + len(page_rows))
+
+    st.dataframe(page_rows, use_container_width=True)
+    st.caption(f"Rows {start + 1 if len(order) else 0}–{start + len(page_rows)} of {len(order)} "
+               f"| page {page} of {n_pages}")
+
+
+def format_dates(values):
+    return values.dt.strftime('%Y-%m-%d')
+
 
 # ============================================================================
 # MULTI-TAB DASHBOARD
 # ============================================================================
+go = lazy_import("plotly.graph_objects")
+
 tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs([
     "📊 Overview & Insights",
     "🔴 Injury Analysis",
@@ -426,17 +545,13 @@ with tab1:
     col1, col2 = st.columns(2)
     
     with col1:
-        top_injuries = df_filtered.groupby('Injury').agg({
-            'Team_Performance_Drop': 'mean',
-            'Injury_Duration_Days': 'mean',
-            'Name': 'count'
-        }).sort_values('Team_Performance_Drop', ascending=False).head(3)
+        top_injuries = injury_impact.head(3)
         
         for idx, (injury, row) in enumerate(top_injuries.iterrows(), 1):
             st.markdown(f"""
             <div class="answer-box">
             <b>#{idx}: {injury}</b><br>
-            <span class="stat-highlight">{row['Team_Performance_Drop']:.2f}</span> Avg Team Drop GD<br>
+            <span class="stat-highlight">{row['Team_Performance_Drop']:.2f}</span> Avg Team Drop {gd_label}<br>
             Recovery: {row['Injury_Duration_Days']:.0f} days | Cases: {int(row['Name'])}
             </div>
             """, unsafe_allow_html=True)
@@ -445,7 +560,7 @@ with tab1:
         st.markdown(f"""
         <div class="answer-box">
         <b>Highest Impact:</b> {top_injuries.index[0]}<br>
-        <span class="stat-highlight">{top_injuries.iloc[0]['Team_Performance_Drop']:.2f}</span> Max Drop GD<br>
+        <span class="stat-highlight">{top_injuries.iloc[0]['Team_Performance_Drop']:.2f}</span> Max Drop {gd_label}<br>
         <b>Avg Recovery:</b> {top_injuries['Injury_Duration_Days'].mean():.0f} days<br>
         Total Cases: {int(top_injuries['Name'].sum())}
         </div>
@@ -459,9 +574,9 @@ with tab1:
     col1, col2 = st.columns(2)
     
     with col1:
-        total_win_before = df_filtered['Win_Ratio_Before'].sum()
-        total_win_during = df_filtered['Win_Ratio_During'].sum()
-        total_matches = len(df_filtered) * 3
+        total_win_before = summary['wins_before']
+        total_win_during = summary['wins_during']
+        total_matches = n_filtered * 3
         
         win_rate_before = (total_win_before / total_matches) * 100 if total_matches > 0 else 0
         win_rate_during = (total_win_during / total_matches) * 100 if total_matches > 0 else 0
@@ -485,14 +600,27 @@ with tab1:
         </div>
         """, unsafe_allow_html=True)
     
+    if adjusted_gd:
+        st.markdown(f"""
+        <div class="answer-box">
+        <b>Opponent-adjusted goal difference</b><br>
+        <span class="stat-highlight">{summary['avg_adj_gd_before']:.2f}</span> avg GD before injury<br>
+        <span class="stat-highlight">{summary['avg_adj_gd_during']:.2f}</span> avg GD during absence<br>
+        (each match GD plus the opponent's rating: the margin expected against an average side)
+        </div>
+        """, unsafe_allow_html=True)
+        with st.expander("Club ratings used for the adjustment"):
+            st.dataframe(
+                opponent_ratings(dataset_name, version).round(2).to_frame(),
+                use_container_width=True
+            )
+    
     st.markdown("---")
     
     # RESEARCH QUESTION 3
     st.markdown('<div class="question-box">❓ Q3: How did players perform after recovery?</div>', unsafe_allow_html=True)
     
-    comeback_players = df_filtered[df_filtered['Performance_Drop_Index'].notna()].nlargest(5, 'Performance_Drop_Index')[
-        ['Name', 'Team Name', 'Injury', 'Performance_Drop_Index', 'Injury_Duration_Days', 'Age']
-    ]
+    comeback_players = results['comebacks'].head(5)
     
     if len(comeback_players) > 0:
         rows = [comeback_players.iloc[0:3], comeback_players.iloc[3:5]]
@@ -519,7 +647,7 @@ with tab1:
     
     with col1:
         st.markdown("#### 📅 Monthly Injury Distribution")
-        monthly_data = df_filtered['Injury_Month_Name'].value_counts().reindex(
+        monthly_data = results['months'].reindex(
             ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
         )
         
@@ -536,10 +664,7 @@ with tab1:
     
     with col2:
         st.markdown("#### 🏆 Most Affected Clubs")
-        club_injuries = df_filtered.groupby('Team Name').agg({
-            'Name': 'count',
-            'Team_Impact_Severity': 'mean'
-        }).sort_values('Name', ascending=False).head(5)
+        club_injuries = results['clubs'].head(5)
         
         club_text = ""
         for idx, (team, row) in enumerate(club_injuries.iterrows(), 1):
@@ -559,10 +684,7 @@ with tab2:
     
     with col1:
         st.markdown("#### Top 10 Injuries - Team Performance Impact")
-        top_injuries_impact = df_filtered.groupby('Injury').agg({
-            'Team_Performance_Drop': 'mean',
-            'Name': 'count'
-        }).sort_values('Team_Performance_Drop', ascending=False).head(10)
+        top_injuries_impact = injury_impact
         
         fig1 = go.Figure()
         fig1.add_trace(go.Bar(
@@ -576,13 +698,13 @@ with tab2:
             ),
             text=top_injuries_impact['Team_Performance_Drop'].round(2),
             textposition='outside',
-            hovertemplate='<b>%{x}</b><br>Avg Drop: %{y:.2f} GD<extra></extra>',
+            hovertemplate=f'<b>%{{x}}</b><br>Avg Drop: %{{y:.2f}} {gd_label}<extra></extra>',
             name='Performance Drop'
         ))
         fig1.update_layout(
             title="Top 10 Injuries by Team Performance Impact",
             xaxis_title="Injury Type",
-            yaxis_title="Average Goal Difference Drop",
+            yaxis_title=f"Average Goal Difference Drop{' (opponent-adjusted)' if adjusted_gd else ''}",
             height=480,
             template="plotly_white",
             xaxis_tickangle=-45,
@@ -592,7 +714,7 @@ with tab2:
     
     with col2:
         st.markdown("#### Injury Severity Distribution")
-        severity_dist = df_filtered['Injury_Severity'].value_counts()
+        severity_dist = results['severity']
         
         colors_map = {'Severe': DANGER_COLOR, 'Moderate': WARNING_COLOR, 'Minor': SUCCESS_COLOR}
         fig2 = go.Figure(data=[go.Pie(
@@ -612,8 +734,13 @@ with tab2:
     
     st.markdown("#### Recovery Duration vs Performance Drop")
     
+    px = lazy_import("plotly.express")
+    scatter_rows = view.rows([
+        'Injury_Duration_Days', 'Performance_Drop_Index', 'Injury_Severity', 'Team_Impact_Severity',
+        'Name', 'Team Name', 'Injury', 'Position', 'Age'
+    ])
     fig3 = px.scatter(
-        df_filtered[df_filtered['Performance_Drop_Index'].notna()],
+        scatter_rows[scatter_rows['Performance_Drop_Index'].notna()],
         x='Injury_Duration_Days',
         y='Performance_Drop_Index',
         color='Injury_Severity',
@@ -638,7 +765,7 @@ with tab3:
     
     with col1:
         st.markdown("#### Most Injured Players (Top 15)")
-        most_injured = df_filtered['Name'].value_counts().head(15)
+        most_injured = results['players']
         
         fig5 = go.Figure()
         fig5.add_trace(go.Bar(
@@ -660,9 +787,7 @@ with tab3:
     
     with col2:
         st.markdown("#### Comeback Players - Performance Improvement")
-        comeback_data = df_filtered[df_filtered['Performance_Drop_Index'].notna()].nlargest(10, 'Performance_Drop_Index')[
-            ['Name', 'Performance_Drop_Index', 'Injury', 'Injury_Duration_Days']
-        ]
+        comeback_data = results['comebacks']
         
         fig6 = go.Figure()
         fig6.add_trace(go.Scatter(
@@ -696,11 +821,14 @@ with tab3:
     
     selected_player = st.selectbox(
         "Select a player to analyze in detail:",
-        options=sorted(df_filtered['Name'].unique()),
+        options=results['player_list'],
         key="player_selector"
     )
     
-    player_data = df_filtered[df_filtered['Name'] == selected_player]
+    player_data = view.rows([
+        'Team Name', 'Position', 'Age', 'FIFA rating', 'Avg_Rating_Before_Injury', 'Avg_Rating_After_Injury',
+        'Date of Injury', 'Injury', 'Injury_Severity', 'Injury_Duration_Days', 'Performance_Drop_Index'
+    ], equals={'Name': selected_player})
     
     if len(player_data) > 0:
         player_info = player_data.iloc[0]
@@ -730,9 +858,13 @@ with tab3:
             st.metric("Severity", player_info['Injury_Severity'])
         
         st.markdown("**Injury History:**")
-        injury_history = player_data[['Date of Injury', 'Injury', 'Injury_Severity', 'Injury_Duration_Days', 'Performance_Drop_Index']].copy()
-        injury_history['Date of Injury'] = injury_history['Date of Injury'].dt.strftime('%Y-%m-%d')
-        st.dataframe(injury_history, use_container_width=True)
+        paged_table(
+            "injury_history",
+            ['Date of Injury', 'Injury', 'Injury_Severity', 'Injury_Duration_Days', 'Performance_Drop_Index'],
+            default_sort='Date of Injury',
+            equals={'Name': selected_player},
+            formatters={'Date of Injury': format_dates}
+        )
 
 # ========== TAB 4: TEAM ANALYTICS ==========
 with tab4:
@@ -742,7 +874,7 @@ with tab4:
     
     with col1:
         st.markdown("#### Teams by Injury Frequency")
-        team_injuries = df_filtered.groupby('Team Name').size().sort_values(ascending=False).head(10)
+        team_injuries = results['clubs']['Name']
         
         fig7 = go.Figure()
         fig7.add_trace(go.Bar(
@@ -765,7 +897,7 @@ with tab4:
     
     with col2:
         st.markdown("#### Team Performance Drop by Club")
-        team_perf = df_filtered.groupby('Team Name')['Team_Performance_Drop'].mean().sort_values(ascending=False).head(10)
+        team_perf = team_drop
         
         fig8 = go.Figure()
         fig8.add_trace(go.Bar(
@@ -774,12 +906,12 @@ with tab4:
             marker=dict(color=team_perf.values, colorscale='RdYlGn_r', showscale=True),
             text=team_perf.values.round(2),
             textposition='outside',
-            hovertemplate='<b>%{x}</b><br>Avg Drop: %{y:.2f} GD<extra></extra>'
+            hovertemplate=f'<b>%{{x}}</b><br>Avg Drop: %{{y:.2f}} {gd_label}<extra></extra>'
         ))
         fig8.update_layout(
             title="Teams Most Affected by Injuries",
             xaxis_title="Team",
-            yaxis_title="Average Performance Drop (GD)",
+            yaxis_title=f"Average Performance Drop ({gd_label})",
             height=450,
             template="plotly_white",
             xaxis_tickangle=-45
@@ -788,14 +920,7 @@ with tab4:
     
     st.markdown("#### 🔥 Injury Hotmap: Months vs Top 10 Clubs")
     
-    top_teams = df_filtered['Team Name'].value_counts().head(10).index
-    heatmap_data = df_filtered[df_filtered['Team Name'].isin(top_teams)].pivot_table(
-        values='Name',
-        index='Team Name',
-        columns='Injury_Month_Name',
-        aggfunc='count',
-        fill_value=0
-    )
+    heatmap_data = results['heatmap']
     
     month_order = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
     heatmap_data = heatmap_data[[m for m in month_order if m in heatmap_data.columns]]
@@ -824,7 +949,7 @@ with tab5:
     
     with col1:
         st.markdown("#### Injury Cases Across Seasons")
-        season_injuries = df_filtered['Season'].value_counts().sort_index()
+        season_injuries = results['seasons']['Cases']
         
         fig11 = go.Figure()
         fig11.add_trace(go.Scatter(
@@ -847,7 +972,7 @@ with tab5:
     
     with col2:
         st.markdown("#### Average Recovery by Season")
-        recovery_by_season = df_filtered.groupby('Season')['Injury_Duration_Days'].mean()
+        recovery_by_season = results['seasons']['Injury_Duration_Days']
         
         fig12 = go.Figure()
         fig12.add_trace(go.Bar(
@@ -868,7 +993,7 @@ with tab5:
         st.plotly_chart(fig12, use_container_width=True)
     
     st.markdown("#### Monthly Injury Distribution")
-    month_injuries = df_filtered['Injury_Month_Name'].value_counts().reindex(
+    month_injuries = results['months'].reindex(
         ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December'],
         fill_value=0
     )
@@ -898,10 +1023,20 @@ with tab6:
     
     st.markdown("#### Correlation Analysis")
     
-    correlation_data = df_filtered[[
-        'Age', 'FIFA rating', 'Injury_Duration_Days', 'Performance_Drop_Index',
-        'Team_Performance_Drop', 'Win_Ratio_Before', 'Win_Ratio_During'
-    ]].corr()
+    exact_stats = sketch_stats is None or st.toggle(
+        "🎯 Recompute exactly",
+        key="exact_stats",
+        help="Scan the filtered rows for exact statistics instead of the sketch estimates."
+    )
+    if exact_stats:
+        stats_rows = view.rows([
+            'Age', 'FIFA rating', 'Injury_Duration_Days', 'Performance_Drop_Index',
+            'Team_Performance_Drop', 'Win_Ratio_Before', 'Win_Ratio_During'
+        ])
+        correlation_data = stats_rows.corr()
+    else:
+        correlation_data = sketch_stats['corr']
+        st.caption("Correlations are exact: they are merged from per-partition co-moment accumulators.")
     
     fig15 = go.Figure(data=go.Heatmap(
         z=correlation_data.values,
@@ -921,11 +1056,18 @@ with tab6:
     st.plotly_chart(fig15, use_container_width=True)
     
     st.markdown("#### Summary Statistics")
-    summary_stats = df_filtered[[
-        'Age', 'FIFA rating', 'Injury_Duration_Days', 'Performance_Drop_Index',
-        'Team_Performance_Drop'
-    ]].describe().round(2)
-    st.dataframe(summary_stats, use_container_width=True)
+    if exact_stats:
+        summary_stats = stats_rows[[
+            'Age', 'FIFA rating', 'Injury_Duration_Days', 'Performance_Drop_Index',
+            'Team_Performance_Drop'
+        ]].describe().round(2)
+        st.dataframe(summary_stats, use_container_width=True)
+    else:
+        summary_stats = sketch_stats['describe'].round(2)
+        st.dataframe(summary_stats, use_container_width=True)
+        st.caption("Error bounds (±): percentiles come from quantile sketches with a tracked rank error; "
+                   "count, mean, std, min and max are exact.")
+        st.dataframe(sketch_stats['bounds'].round(3), use_container_width=True)
 
 # ========== TAB 7: DATA EXPORT ==========
 with tab7:
@@ -935,47 +1077,97 @@ with tab7:
     
     columns_to_export = st.multiselect(
         "Select columns to export:",
-        options=df_filtered.columns.tolist(),
-        default=['Name', 'Team Name', 'Position', 'Age', 'Injury', 'Injury_Severity',
-                'Injury_Duration_Days', 'Performance_Drop_Index', 'Team_Performance_Drop'],
+        options=backend.columns,
+        default=DEFAULT_EXPORT_COLUMNS,
         key="export_columns"
     )
     
-    export_df = df_filtered[columns_to_export].sort_values('Performance_Drop_Index', ascending=False)
-    
-    st.dataframe(export_df, use_container_width=True, height=400)
+    paged_table("export_preview", columns_to_export, default_sort='Performance_Drop_Index')
+    
+    def export_file(export_format, compression=None):
+        """
+        Download data that is only built when its button is clicked, so
+        reruns never serialize the filtered set. Rows come highest
+        Performance_Drop_Index first (when exported) through the same cached
+        order as the preview's default sort.
+        """
+        def build():
+            if export_format == 'excel':
+                lazy_import("openpyxl")
+            # Runs on its own thread after the click: query through a fresh view
+            export_view = get_query_backend(dataset_name, version).view(filter_state)
+            if 'Performance_Drop_Index' in columns_to_export:
+                order = sort_order(dataset_name, version, filter_state, 'Performance_Drop_Index')
+                export_df = export_view.fetch(order, columns_to_export)
+            else:
+                export_df = export_view.rows(columns_to_export)
+            return export_bytes(export_df, export_format, compression=compression)
+        return build
+    
+    export_stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        csv = export_df.to_csv(index=False)
         st.download_button(
             label="📥 Download as CSV",
-            data=csv,
-            file_name=f"injury_analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-            mime="text/csv"
+            data=export_file('csv'),
+            file_name=f"injury_analysis_{export_stamp}.csv",
+            mime=EXPORT_FORMATS['csv'][1]
         )
     
     with col2:
-        excel_buffer = BytesIO()
-        with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-            export_df.to_excel(writer, sheet_name='Injuries', index=False)
-        excel_buffer.seek(0)
         st.download_button(
             label="📊 Download as Excel",
-            data=excel_buffer,
-            file_name=f"injury_analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            data=export_file('excel'),
+            file_name=f"injury_analysis_{export_stamp}.xlsx",
+            mime=EXPORT_FORMATS['excel'][1]
         )
     
     with col3:
-        json_data = export_df.to_json(orient='records', indent=2)
         st.download_button(
             label="🔗 Download as JSON",
-            data=json_data,
-            file_name=f"injury_analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
-            mime="application/json"
+            data=export_file('json'),
+            file_name=f"injury_analysis_{export_stamp}.json",
+            mime=EXPORT_FORMATS['json'][1]
         )
+    
+    st.markdown("#### 🗄️ Columnar Formats (typed, for notebooks & warehouse loads)")
+    
+    try:
+        lazy_import("pyarrow")
+    except ImportError:
+        st.info("Install `pyarrow` to enable Parquet and Arrow IPC downloads.")
+    else:
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            parquet_codec = st.selectbox(
+                "Parquet compression",
+                options=EXPORT_FORMATS['parquet'][2],
+                format_func=lambda codec: codec or 'none',
+                key="parquet_compression"
+            )
+            st.download_button(
+                label="🧱 Download as Parquet",
+                data=export_file('parquet', parquet_codec),
+                file_name=f"injury_analysis_{export_stamp}.parquet",
+                mime=EXPORT_FORMATS['parquet'][1]
+            )
+        
+        with col2:
+            arrow_codec = st.selectbox(
+                "Arrow IPC compression",
+                options=EXPORT_FORMATS['arrow'][2],
+                format_func=lambda codec: codec or 'none',
+                key="arrow_compression"
+            )
+            st.download_button(
+                label="🏹 Download as Arrow IPC",
+                data=export_file('arrow', arrow_codec),
+                file_name=f"injury_analysis_{export_stamp}.arrow",
+                mime=EXPORT_FORMATS['arrow'][1]
+            )
 
 # ============================================================================
 # FOOTER
@@ -989,4 +1181,62 @@ Jwal Patel 2013409<br>
 Data Source: Player Injuries & Team Performance | Updated: {datetime.now().strftime('%B %d, %Y')}<br>
 &copy; 2025 FootLens Analytics.
 </div>
-''', unsafe_allow_html=True)
\ No newline at end of file
+''', unsafe_allow_html=True)
+
+mark_startup("Page complete")
+
+with st.sidebar.expander("🩺 Data Quality", expanded=False):
+    quality_report = backend.quality_report
+    if dataset_name in rejected_versions:
+        rejected_report = rejected_versions[dataset_name][1]
+        st.warning(f"A newer file failed the quality gate ({ISSUE_TYPES[rejected_report.failed]}); "
+                   f"still serving the previous version.")
+    if quality_report is None:
+        st.caption("No quality report for this data source.")
+    else:
+        st.caption(f"{quality_report.n_rows:,} source rows checked")
+        st.dataframe(quality_report.summary().style.format({'Share': '{:.1%}', 'Threshold': '{:.0%}'}),
+                     use_container_width=True, hide_index=True)
+        quality_samples = quality_report.sample_frame()
+        if not quality_samples.empty:
+            st.markdown("**Sample rows**")
+            st.dataframe(quality_samples, use_container_width=True, hide_index=True)
+
+with st.sidebar.expander("🧠 Cache Memory", expanded=False):
+    cache_summary = cache.summary()
+    st.caption(f"{cache_summary['used_mb']:.1f} of {cache_summary['budget_mb']:.0f} MB in "
+               f"{cache_summary['entries']} entries | hits {cache_summary['hits']}, "
+               f"misses {cache_summary['misses']}, evictions {cache_summary['evictions']}")
+    st.dataframe(cache.usage().round(2), use_container_width=True, hide_index=True)
+
+if PROFILE_STARTUP:
+    with st.sidebar.expander("⏱️ Startup Profile", expanded=False):
+        st.markdown("**Lazy imports (first load in this process)**")
+        st.dataframe(
+            pd.DataFrame(
+                [(name, secs * 1000) for name, secs in startup_profile["imports"].items()],
+                columns=['Module', 'Import (ms)']
+            ).round(1),
+            use_container_width=True
+        )
+        st.markdown("**Checkpoints (this run)**")
+        st.dataframe(
+            pd.DataFrame(
+                [(name, secs * 1000) for name, secs in startup_profile["checkpoints"].items()],
+                columns=['Checkpoint', 'Elapsed (ms)']
+            ).round(1),
+            use_container_width=True
+        )
+        st.markdown("**Feature pipeline (this process)**")
+        feature_profile = FEATURES.describe()[['Feature', 'Stage', 'Downstream', 'Computed', 'Reused', 'Last s']]
+        feature_profile['Last s'] = feature_profile['Last s'] * 1000
+        st.dataframe(
+            feature_profile.rename(columns={'Last s': 'Last compute (ms)'}).round(1),
+            use_container_width=True, hide_index=True
+        )
+        warm_status = start_warmer().status
+        if warm_status['warmed_at'] is not None:
+            st.caption(f"Cache warm-up: {warm_status['states']} filter states in {warm_status['seconds']:.2f}s, "
+                       f"{time.time() - warm_status['warmed_at']:.0f}s ago")
+        if warm_status['error']:
+            st.caption(f"Cache warm-up error: {warm_status['error']}")
\ No newline at end of file
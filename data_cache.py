@@ -0,0 +1,317 @@
+"""
+Cached data access for the Football Injury Impact Dashboard.
+
+The cached functions live in a module rather than in app.py so that dashboard
+sessions and the background warm-up thread (warmup.py, serve.py) share the
+same cache entries. Every dataset in the registry (dataset_registry.py) is a
+namespace of one process-wide, memory-budgeted LRU cache, and every entry is
+keyed by a data version (the source file's modification time).
+
+Reloads are double-buffered: sessions read the published version of a
+dataset, while the warmer thread watches the source files, builds and warms a
+changed file's version in the background, then swaps it in. A run that
+started on the old version finishes on it; the old version's cache entries
+are dropped at the swap and its frame is freed when the last run holding it
+ends.
+"""
+
+import logging
+import os
+import threading
+import weakref
+
+from data_quality import DEFAULT_THRESHOLDS, ISSUE_TYPES, DataQualityError
+from dataset_registry import MemoryBudgetCache, load_registry
+from injury_data import DEFAULT_DATA_PATH, FilterState
+from opponent_strength import RATING_INPUT_COLUMNS, fit_ratings
+from query_backend import dashboard_aggregates, default_filter_state, open_backend
+from sketches import SKETCH_COLUMNS, PartitionedSketches, SketchBundle
+from warmup import CacheWarmer, UsageLog
+
+logger = logging.getLogger(__name__)
+
+# Source dataset; override with INJURY_DASHBOARD_DATA (used by load_test.py)
+DATA_PATH = os.environ.get("INJURY_DASHBOARD_DATA", DEFAULT_DATA_PATH)
+
+# Query backend: "pandas" (default, in memory) or "duckdb" (SQL over Parquet).
+# INJURY_DASHBOARD_PARQUET points DuckDB at an existing engineered Parquet file.
+QUERY_BACKEND = os.environ.get("INJURY_DASHBOARD_BACKEND", "pandas")
+PARQUET_PATH = os.environ.get("INJURY_DASHBOARD_PARQUET")
+
+# Several datasets: a JSON registry of {name: {"data": ..., "parquet": ...,
+# "backend": ...}}. Without one, only DATA_PATH is served.
+DATASETS_PATH = os.environ.get("INJURY_DASHBOARD_DATASETS", "datasets.json")
+
+# Data-quality gate: loading a file fails when the share of rows affected by
+# any one issue type exceeds INJURY_DASHBOARD_MAX_ISSUE_RATE (data_quality.py)
+MAX_ISSUE_RATE = os.environ.get("INJURY_DASHBOARD_MAX_ISSUE_RATE")
+QUALITY_THRESHOLDS = ({issue: float(MAX_ISSUE_RATE) for issue in ISSUE_TYPES}
+                      if MAX_ISSUE_RATE else DEFAULT_THRESHOLDS)
+
+# Worker processes for preprocessing a dataset's CSV (1 = in-process)
+PREPROCESS_WORKERS = int(os.environ.get("INJURY_DASHBOARD_WORKERS", "1"))
+
+# Per-feature cache (feature_dag.py): reloads recompute only the engineered
+# features whose inputs changed. INJURY_DASHBOARD_FEATURE_CACHE=0 turns it off.
+FEATURE_CACHE = os.environ.get("INJURY_DASHBOARD_FEATURE_CACHE", "1") == "1"
+
+# Process-wide memory budget for all datasets' frames, indexes and aggregates
+MEMORY_BUDGET_MB = float(os.environ.get("INJURY_DASHBOARD_MEMORY_MB", "1024"))
+
+# Approximate statistics mode: sketch-based distinct counts, percentiles and
+# correlations. INJURY_DASHBOARD_APPROX=1 turns it on by default.
+APPROXIMATE_STATS = os.environ.get("INJURY_DASHBOARD_APPROX", "0") == "1"
+
+# Warm-up: filter states requested by analysts are logged to USAGE_LOG_PATH
+# (empty disables logging) and the most frequent ones are precomputed. The
+# warmer also checks the source files for changes every WARMUP_POLL_SECONDS.
+USAGE_LOG_PATH = os.environ.get("INJURY_DASHBOARD_USAGE_LOG", "usage_log.jsonl")
+WARMUP_TOP_STATES = int(os.environ.get("INJURY_DASHBOARD_WARMUP_STATES", "5"))
+WARMUP_POLL_SECONDS = float(os.environ.get("INJURY_DASHBOARD_WARMUP_POLL", "5"))
+
+registry = load_registry(DATASETS_PATH, DATA_PATH, QUERY_BACKEND, PARQUET_PATH)
+DEFAULT_DATASET = next(iter(registry))
+
+cache = MemoryBudgetCache(int(MEMORY_BUDGET_MB * 2 ** 20))
+usage_log = UsageLog(USAGE_LOG_PATH) if USAGE_LOG_PATH else None
+
+# Process-wide record of lazy import costs (seconds) and the checkpoint timings
+# of the most recent script run. It lives here rather than in a cached app.py
+# function, whose globals would keep the previous run (and the data version it
+# used) alive.
+startup_profile = {"imports": {}, "checkpoints": {}}
+
+
+def data_version(dataset_name=DEFAULT_DATASET):
+    """
+    Version stamp of the file a dataset's backend reads: its modification time.
+    """
+    dataset = registry[dataset_name]
+    source = dataset.parquet_path if dataset.backend == 'duckdb' and dataset.parquet_path else dataset.data_path
+    return os.path.getmtime(source)
+
+
+# ============================================================================
+# VERSION SWAPS
+# ============================================================================
+_published = {}
+_retired_versions = set()
+_retired_backends = weakref.WeakValueDictionary()
+_publish_lock = threading.Lock()
+
+
+def current_version(dataset_name=DEFAULT_DATASET):
+    """
+    The version of a dataset that new script runs should use. Only the very
+    first request for a dataset builds it in the foreground; later file
+    changes are swapped in by the warmer once they are ready.
+    """
+    version = _published.get(dataset_name)
+    if version is None:
+        version = data_version(dataset_name)
+        get_query_backend(dataset_name, version)
+        publish_version(dataset_name, version)
+        version = _published[dataset_name]
+    return version
+
+
+def publish_version(dataset_name, version):
+    """
+    Atomically make a built version current. Older versions' entries leave
+    the cache; their backend stays reachable for runs still holding it and is
+    freed with the last of them.
+    """
+    with _publish_lock:
+        previous = _published.get(dataset_name)
+        if previous == version:
+            return
+        _published[dataset_name] = version
+        if previous is not None:
+            _retired_versions.add((dataset_name, previous))
+            old_backend = cache.peek(dataset_name, 'backend', (previous,))
+            if old_backend is not None:
+                _retired_backends[(dataset_name, previous)] = old_backend
+    if previous is not None:
+        cache.drop(dataset_name, keep=lambda kind, key: key[0] == version)
+
+
+def _cached(dataset_name, kind, key, build):
+    """
+    cache.get for a key that starts with the data version, except that runs
+    still on a swapped-out version are answered without putting old-version
+    results back into the cache.
+    """
+    if (dataset_name, key[0]) in _retired_versions:
+        return build()
+    return cache.get(dataset_name, kind, key, build)
+
+
+def get_query_backend(dataset_name, version):
+    """
+    Shared query backend for one version of a dataset. The pandas backend keeps
+    the engineered frame and its presorted range indexes in memory, read-only
+    across sessions. A file that fails the data-quality gate raises
+    DataQualityError, and a changed file that fails it is never swapped in.
+    Engineered features live in the shared "features" namespace, so a new
+    version reuses every feature whose inputs did not change.
+    """
+    retired = _retired_backends.get((dataset_name, version))
+    if retired is not None:
+        return retired
+    dataset = registry[dataset_name]
+    return _cached(dataset_name, 'backend', (version,),
+                   lambda: open_backend(dataset.backend, dataset.data_path, dataset.parquet_path,
+                                        dataset.known_teams, QUALITY_THRESHOLDS, PREPROCESS_WORKERS,
+                                        dataset.feature_params, cache if FEATURE_CACHE else None))
+
+
+def dataset_totals(dataset_name, version):
+    """
+    Unfiltered record, player and team counts for the sidebar deltas.
+    """
+    def build():
+        overall = get_query_backend(dataset_name, version).view(FilterState())
+        totals = overall.aggregate(None, {'players': ('Name', 'nunique'), 'teams': ('Team Name', 'nunique')})
+        return {'records': overall.count(), 'players': int(totals['players']), 'teams': int(totals['teams'])}
+
+    return _cached(dataset_name, 'totals', (version,), build)
+
+
+def dashboard_results(dataset_name, version, filter_state, approximate=False):
+    """
+    All dashboard aggregates for one filter state (see dashboard_aggregates).
+    """
+    def build():
+        backend = get_query_backend(dataset_name, version)
+        return dashboard_aggregates(backend.view(filter_state), approximate=approximate)
+
+    return _cached(dataset_name, 'aggregates', (version, filter_state, approximate), build)
+
+
+def get_partition_sketches(dataset_name, version):
+    """
+    Sketches of every categorical filter partition, built in one pass per
+    data version and shared by all sessions.
+    """
+    def build():
+        overall = get_query_backend(dataset_name, version).view(FilterState())
+        return PartitionedSketches(overall.rows(SKETCH_COLUMNS))
+
+    return _cached(dataset_name, 'sketches', (version,), build)
+
+
+def approximate_statistics(dataset_name, version, filter_state):
+    """
+    Sketch-based statistics for one filter state (see SketchBundle.statistics).
+    Categorical selections merge the prebuilt partition sketches; range
+    filters cut across partitions, so those rows are sketched in one pass.
+    """
+    def build():
+        if filter_state.ranges:
+            view = get_query_backend(dataset_name, version).view(filter_state)
+            return SketchBundle.from_frame(view.rows(SKETCH_COLUMNS)).statistics()
+        return get_partition_sketches(dataset_name, version).select(filter_state).statistics()
+
+    return _cached(dataset_name, 'approximate', (version, filter_state), build)
+
+
+def opponent_ratings(dataset_name, version):
+    """
+    Club ratings behind the opponent-adjusted GD columns, strongest first.
+    """
+    def build():
+        overall = get_query_backend(dataset_name, version).view(FilterState())
+        return fit_ratings(overall.rows(RATING_INPUT_COLUMNS)).sort_values(ascending=False)
+
+    return _cached(dataset_name, 'ratings', (version,), build)
+
+
+def sort_order(dataset_name, version, filter_state, order_by, ascending=False, equals=()):
+    """
+    Row ids of a filter state's rows (optionally narrowed by equals, a tuple
+    of (column, value) pairs) in display order, kept for page flips.
+    """
+    def build():
+        backend = get_query_backend(dataset_name, version)
+        view = backend.view(filter_state)
+        if backend.name == 'pandas':
+            # The whole-frame order of the column is shared by every filter state
+            column_order = _cached(dataset_name, 'column_orders', (version, order_by, ascending),
+                                   lambda: backend.sort_order(order_by, ascending))
+            return view.sort_order(order_by, ascending, dict(equals), column_order)
+        return view.sort_order(order_by, ascending, dict(equals))
+
+    return _cached(dataset_name, 'sort_orders', (version, filter_state, order_by, ascending, equals), build)
+
+
+def record_usage(dataset_name, filter_state):
+    if usage_log is not None:
+        usage_log.record(registry[dataset_name].data_path, filter_state)
+
+
+# ============================================================================
+# WARM-UP
+# ============================================================================
+# Dataset -> (version, QualityReport) of a changed file that failed the
+# data-quality gate and was not swapped in
+rejected_versions = {}
+
+
+def warm_datasets():
+    """
+    Datasets worth keeping warm: the default one and any a session has loaded
+    (still resident in the cache). Unused datasets are never loaded.
+    """
+    return list(dict.fromkeys([DEFAULT_DATASET] + [name for name in cache.namespaces() if name in registry]))
+
+
+def warm_versions():
+    return tuple((name, data_version(name)) for name in warm_datasets())
+
+
+def warm_caches(versions):
+    """
+    For each warm dataset version, build the backend, then precompute the
+    totals and the aggregates of the default filter state and the most
+    requested ones. A version that differs from the published one (the file
+    changed) is swapped in only once all of that is ready, and never if it
+    fails the data-quality gate.
+    """
+    warmed = 0
+    for dataset_name, version in versions:
+        try:
+            backend = get_query_backend(dataset_name, version)
+        except DataQualityError as e:
+            # Keep serving the published version; the file is retried once it changes again
+            rejected_versions[dataset_name] = (version, e.report)
+            logger.error("Not publishing %s (version %s): %s", dataset_name, version, e)
+            continue
+        rejected_versions.pop(dataset_name, None)
+        dataset_totals(dataset_name, version)
+
+        states = [default_filter_state(backend)]
+        if usage_log is not None:
+            states += usage_log.most_frequent(registry[dataset_name].data_path, WARMUP_TOP_STATES)
+        states = list(dict.fromkeys(states))
+        for state in states:
+            dashboard_results(dataset_name, version, state, APPROXIMATE_STATS)
+            if APPROXIMATE_STATS:
+                approximate_statistics(dataset_name, version, state)
+        warmed += len(states)
+        publish_version(dataset_name, version)
+    return warmed
+
+
+_warmer = None
+_warmer_lock = threading.Lock()
+
+
+def start_warmer(ready_fn=None):
+    """
+    Start the process-wide cache warmer once; later calls return the same one.
+    """
+    global _warmer
+    with _warmer_lock:
+        if _warmer is None:
+            _warmer = CacheWarmer(warm_caches, warm_versions, WARMUP_POLL_SECONDS, ready_fn).start()
+    return _warmer
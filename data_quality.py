@@ -0,0 +1,286 @@
+"""
+Data-quality validation for incoming injury files.
+
+The date, rating and GD columns are parsed once, vectorised, and the same
+pass records every value the old per-cell coercion would have silently
+turned into NaN or NaT. The report has counts and sample rows per issue
+type. Loading fails fast once an issue's share of rows exceeds its
+threshold. Placeholders the source uses on purpose ("N.A.", a return date
+of "Present", "(S)"/"(A)" rating suffixes) are not issues.
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+
+DATE_COLUMNS = ['Date of Injury', 'Date of return']
+
+# Values the source uses for "no data" rather than malformed input
+MISSING_MARKERS = ['N.A.']
+OPEN_RETURN_MARKERS = ['Present']
+
+RATING_SUFFIXES = ['(S)', '(A)']
+
+# Plausible ranges; anything outside is reported as out of range
+FIFA_RATING_RANGE = (1, 99)
+MATCH_RATING_RANGE = (0, 10)
+
+# Clubs of the shipped Premier League dataset (teams and opponents). A
+# dataset registry entry can replace this list ("teams") or disable the check.
+KNOWN_CLUBS = frozenset([
+    'Arsenal', 'Aston Villa', 'Bournemouth', 'Brentford', 'Brighton', 'Burnley', 'Chelsea',
+    'Crystal Palace', 'Everton', 'Fulham', 'Leeds', 'Leicester', 'Liverpool', 'Luton Town',
+    'Man City', 'Man United', 'Newcastle', 'Norwich City', 'Nottm Forest', 'Sheffield',
+    'Southampton', 'Tottenham', 'Watford', 'West Brom', 'West Ham', 'Wolves',
+])
+
+ISSUE_TYPES = {
+    'unparseable_date': "Date that could not be parsed",
+    'return_before_injury': "Return date before the injury date",
+    'out_of_range_rating': "Rating that is not a number in the plausible range",
+    'non_numeric_gd': "Goal difference that is not a number",
+    'unknown_team': "Team or opposition not in the known clubs",
+}
+
+# Largest tolerated share of affected rows per issue type before loading fails
+DEFAULT_THRESHOLDS = {issue: 0.2 for issue in ISSUE_TYPES}
+
+SAMPLE_ROWS = 5
+
+
+class DataQualityError(ValueError):
+    """
+    Raised when an issue type exceeds its threshold; carries the report so far.
+    """
+
+    def __init__(self, report):
+        self.report = report
+        issue = report.failed
+        super().__init__(
+            f"Data quality check failed: {ISSUE_TYPES[issue]} in {report.counts[issue]} of "
+            f"{report.n_rows} rows ({report.rate(issue):.1%}), above the {report.thresholds[issue]:.1%} threshold"
+        )
+
+
+class QualityReport:
+    """
+    Affected-row counts and sample rows per issue type for one file.
+    Sample rows are numbered as lines of the source CSV (header is line 1).
+    """
+
+    def __init__(self, n_rows, thresholds=None):
+        self.n_rows = n_rows
+        self.thresholds = dict(thresholds or {})
+        self.counts = {}
+        self.samples = {}
+        self.failed = None
+
+    def rate(self, issue):
+        return self.counts.get(issue, 0) / self.n_rows if self.n_rows else 0.0
+
+    @property
+    def passed(self):
+        return self.failed is None
+
+    def record(self, issue, mask, raw, sample_size=SAMPLE_ROWS):
+        """
+        Record an issue from a boolean frame (rows x checked columns) aligned with raw.
+        """
+        flags = mask.to_numpy()
+        affected = flags.any(axis=1)
+        self.counts[issue] = int(affected.sum())
+        sample = []
+        for position in np.flatnonzero(affected)[:sample_size]:
+            column = mask.columns[np.argmax(flags[position])]
+            sample.append({'line': int(position) + 2, 'column': column, 'value': str(raw[column].iloc[position])})
+        self.samples[issue] = sample
+
+        self._check(issue)
+
+    def _check(self, issue):
+        threshold = self.thresholds.get(issue)
+        if threshold is not None and self.rate(issue) > threshold:
+            self.failed = issue
+            raise DataQualityError(self)
+
+    def check(self, thresholds=None):
+        """
+        Apply thresholds (DEFAULT_THRESHOLDS if None) to the recorded counts,
+        raising DataQualityError for the first issue type over its threshold.
+        """
+        self.thresholds = dict(DEFAULT_THRESHOLDS if thresholds is None else thresholds)
+        for issue in self.counts:
+            self._check(issue)
+        return self
+
+    @classmethod
+    def merged(cls, reports, sources=None, sample_size=SAMPLE_ROWS):
+        """
+        One report for the rows of several partitions, in order. Each
+        partition's sample lines are numbered within its part of the source;
+        consecutive partitions of the same source (given in sources, e.g. the
+        file name per report) are renumbered to lines of the whole file. With
+        more than one distinct source, samples also name their file.
+        """
+        sources = list(sources) if sources is not None else [None] * len(reports)
+        label_files = len(set(sources)) > 1
+        report = cls(sum(part.n_rows for part in reports))
+        offset, previous = 0, object()
+        for part, source in zip(reports, sources):
+            offset = offset if source == previous else 0
+            for issue, count in part.counts.items():
+                report.counts[issue] = report.counts.get(issue, 0) + count
+                samples = report.samples.setdefault(issue, [])
+                for sample in part.samples[issue][:sample_size - len(samples)]:
+                    sample = {**sample, 'line': sample['line'] + offset}
+                    if label_files:
+                        sample['file'] = source
+                    samples.append(sample)
+            offset += part.n_rows
+            previous = source
+        return report
+
+    def summary(self):
+        """
+        One row per checked issue type: affected rows, share and threshold.
+        """
+        return pd.DataFrame(
+            [(ISSUE_TYPES[issue], count, self.rate(issue), self.thresholds.get(issue))
+             for issue, count in self.counts.items()],
+            columns=['Issue', 'Rows', 'Share', 'Threshold']
+        )
+
+    def sample_frame(self):
+        samples = [{'Issue': ISSUE_TYPES[issue], **sample} for issue, samples in self.samples.items()
+                   for sample in samples]
+        columns = ['Issue'] + (['file'] if any('file' in sample for sample in samples) else []) + \
+                  ['line', 'column', 'value']
+        return pd.DataFrame(samples, columns=columns).rename(
+            columns={'file': 'File', 'line': 'CSV line', 'column': 'Column', 'value': 'Value'})
+
+    def to_json(self):
+        return json.dumps({'n_rows': self.n_rows, 'thresholds': self.thresholds, 'counts': self.counts,
+                           'samples': self.samples, 'failed': self.failed})
+
+    @classmethod
+    def from_json(cls, text):
+        data = json.loads(text)
+        report = cls(data['n_rows'], data['thresholds'])
+        report.counts, report.samples, report.failed = data['counts'], data['samples'], data['failed']
+        return report
+
+
+# ============================================================================
+# VECTORISED PARSING
+# ============================================================================
+# Source columns repeat a few thousand distinct values across millions of
+# rows, so each column is factorised once and every parse and check runs on
+# its distinct values; the results are expanded back to rows by code.
+def _distinct(raw):
+    """
+    (codes, distinct values) of a column; missing cells get code -1.
+    """
+    codes, uniques = pd.factorize(raw)
+    return codes, pd.Series(uniques, dtype=object if raw.dtype == object else None)
+
+
+def _expand(codes, per_value, missing):
+    """
+    Per-row array from per-distinct-value results; code -1 gets missing.
+    """
+    per_value = np.asarray(per_value)
+    return np.append(per_value, np.array([missing], dtype=per_value.dtype))[codes]
+
+
+def _to_number(values, suffixes=()):
+    """
+    Numbers from source values; placeholders and malformed values become NaN.
+    Only the values that fail the plain conversion get the suffix clean-up.
+    """
+    numbers = pd.to_numeric(values, errors='coerce').astype('float64')
+    if suffixes:
+        retry = numbers.isna() & ~values.isin(MISSING_MARKERS)
+        if retry.any():
+            text = values[retry].astype(str)
+            for suffix in suffixes:
+                text = text.str.replace(suffix, '', regex=False)
+            numbers[retry] = pd.to_numeric(text.str.strip(), errors='coerce')
+    return numbers
+
+
+def infer_date_formats(raw):
+    """
+    {date column: strftime format} guessed from the column's first value, as
+    pd.to_datetime would; 'mixed' (parse each value on its own) when the
+    first value gives no format.
+    """
+    formats = {}
+    for col in DATE_COLUMNS:
+        present = raw[col].dropna()
+        first = present.iloc[0] if len(present) else None
+        formats[col] = (guess_datetime_format(first) if isinstance(first, str) else None) or 'mixed'
+    return formats
+
+
+def parse_and_validate(raw, known_teams=KNOWN_CLUBS, thresholds=None, sample_size=SAMPLE_ROWS, date_formats=None):
+    """
+    Parse the date, match rating and GD columns of a freshly read file and
+    validate them in the same pass.
+
+    date_formats (see infer_date_formats) defaults to the formats of raw
+    itself; a slice of a larger load should be given the whole load's.
+
+    Returns ({column: parsed Series}, QualityReport). Raises DataQualityError
+    as soon as an issue type exceeds its threshold.
+    """
+    report = QualityReport(len(raw), DEFAULT_THRESHOLDS if thresholds is None else thresholds)
+    date_formats = date_formats or infer_date_formats(raw)
+    parsed = {}
+
+    def record(issue, masks):
+        report.record(issue, pd.DataFrame(masks, index=raw.index), raw, sample_size)
+
+    # Dates
+    unparseable = {}
+    for col in DATE_COLUMNS:
+        codes, values = _distinct(raw[col])
+        dates = pd.to_datetime(values, format=date_formats[col], errors='coerce')
+        parsed[col] = pd.Series(_expand(codes, dates, np.datetime64('NaT')), index=raw.index)
+        unparseable[col] = _expand(codes, dates.isna() & ~values.isin(MISSING_MARKERS + OPEN_RETURN_MARKERS), False)
+    record('unparseable_date', unparseable)
+    record('return_before_injury', {'Date of return': parsed['Date of return'] < parsed['Date of Injury']})
+
+    # Ratings: the FIFA rating (validated only) and every match player rating
+    rating_ranges = [('FIFA rating', FIFA_RATING_RANGE)] + \
+                    [(col, MATCH_RATING_RANGE) for col in raw.columns if 'Player_rating' in col]
+    bad_rating = {}
+    for col, (low, high) in rating_ranges:
+        codes, values = _distinct(raw[col])
+        numbers = _to_number(values, RATING_SUFFIXES)
+        if col != 'FIFA rating':
+            parsed[col] = pd.Series(_expand(codes, numbers, np.nan), index=raw.index)
+        bad = (numbers.isna() & ~values.isin(MISSING_MARKERS)) | (numbers < low) | (numbers > high)
+        bad_rating[col] = _expand(codes, bad, False)
+    record('out_of_range_rating', bad_rating)
+
+    # Goal differences
+    bad_gd = {}
+    for col in [col for col in raw.columns if '_GD' in col]:
+        codes, values = _distinct(raw[col])
+        numbers = _to_number(values)
+        parsed[col] = pd.Series(_expand(codes, numbers, np.nan), index=raw.index)
+        bad_gd[col] = _expand(codes, numbers.isna() & ~values.isin(MISSING_MARKERS), False)
+    record('non_numeric_gd', bad_gd)
+
+    # Clubs
+    if known_teams is not None:
+        accepted = list(known_teams) + MISSING_MARKERS
+        unknown = {}
+        for col in ['Team Name'] + [col for col in raw.columns if col.endswith('_Opposition')]:
+            codes, values = _distinct(raw[col])
+            unknown[col] = _expand(codes, ~values.isin(accepted), False)
+        record('unknown_team', unknown)
+
+    return parsed, report
@@ -0,0 +1,301 @@
+"""
+Dataset registry and memory-budgeted cache for the Football Injury Impact Dashboard.
+
+One deployment can serve several injury datasets (leagues, season archives)
+side by side. Each dataset is a namespace in a single process-wide cache
+holding its query backend (engineered frame and range indexes) and its
+aggregate results. The cache has a memory budget: when it is exceeded, the
+least recently used entries of any dataset are evicted. Nothing is loaded
+for a dataset until a session asks for it.
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+from data_quality import KNOWN_CLUBS
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# REGISTRY
+# ============================================================================
+class Dataset(NamedTuple):
+    name: str
+    data_path: str
+    parquet_path: Optional[str] = None
+    backend: str = 'pandas'
+    known_teams: Optional[frozenset] = KNOWN_CLUBS
+    feature_params: Optional[dict] = None
+
+
+def load_registry(registry_path, default_data_path, default_backend, default_parquet_path=None):
+    """
+    Datasets by name, in display order.
+
+    The registry is a JSON object mapping display names to
+    {"data": csv_path, "parquet": optional_path, "backend": optional_name,
+    "teams": optional_club_list, "features": optional_params}; relative paths
+    are resolved against the registry file. "teams" replaces the clubs the
+    data-quality check accepts (null disables that check). "features"
+    overrides feature parameters such as the severity keywords or Age_Group
+    bins (injury_data.FEATURE_PARAMS). Without a registry file, the single
+    default dataset is served.
+    """
+    if not registry_path or not os.path.exists(registry_path):
+        name = os.path.splitext(os.path.basename(default_data_path))[0]
+        return {name: Dataset(name, default_data_path, default_parquet_path, default_backend)}
+
+    base = os.path.dirname(os.path.abspath(registry_path))
+
+    def resolve(path):
+        return path if path is None or os.path.isabs(path) else os.path.join(base, path)
+
+    with open(registry_path) as registry_file:
+        entries = json.load(registry_file)
+    if not entries:
+        raise ValueError(f"Dataset registry {registry_path} is empty")
+
+    def known_teams(entry):
+        teams = entry.get('teams', KNOWN_CLUBS)
+        return None if teams is None else frozenset(teams)
+
+    return {
+        name: Dataset(name, resolve(entry['data']), resolve(entry.get('parquet')),
+                      entry.get('backend', default_backend), known_teams(entry), entry.get('features'))
+        for name, entry in entries.items()
+    }
+
+
+# ============================================================================
+# MEMORY ACCOUNTING
+# ============================================================================
+def _array_nbytes(array, seen):
+    """
+    Memory held by one column's values. A buffer is counted once, under the
+    array that owns it (views and columns of one block share it), and so is
+    each object of an object column, however many rows refer to it.
+    """
+    if isinstance(array, pd.Categorical):
+        return _array_nbytes(array.codes, seen) + estimate_nbytes(array.categories, seen)
+    array = getattr(array, '_ndarray', array)
+    if not isinstance(array, np.ndarray):
+        return int(array.nbytes)
+
+    owner = array
+    while isinstance(owner.base, np.ndarray):
+        owner = owner.base
+    if id(owner) in seen:
+        return 0
+    seen.add(id(owner))
+    nbytes = owner.nbytes
+    if owner.dtype == object and owner.size:
+        items = owner.ravel()
+        object_ids, first = np.unique(np.fromiter(map(id, items), dtype=np.uint64, count=len(items)),
+                                      return_index=True)
+        for object_id, position in zip(object_ids.tolist(), first.tolist()):
+            if object_id not in seen:
+                seen.add(object_id)
+                nbytes += sys.getsizeof(items[position])
+    return nbytes
+
+
+def estimate_nbytes(value, _seen=None):
+    """
+    Approximate memory held by a cached value: pandas objects and arrays
+    their buffers (see _array_nbytes), containers and plain objects the sum
+    of their contents. Objects may define nbytes themselves.
+    """
+    if _seen is None:
+        _seen = set()
+    if id(value) in _seen:
+        return 0
+    _seen.add(id(value))
+
+    if isinstance(value, pd.DataFrame):
+        return (sum(_array_nbytes(value.iloc[:, i].array, _seen) for i in range(value.shape[1]))
+                + estimate_nbytes(value.index, _seen))
+    if isinstance(value, pd.Series):
+        return _array_nbytes(value.array, _seen) + estimate_nbytes(value.index, _seen)
+    if isinstance(value, pd.RangeIndex):
+        return value.memory_usage()
+    if isinstance(value, pd.MultiIndex):
+        return (sum(estimate_nbytes(level, _seen) for level in value.levels)
+                + sum(_array_nbytes(codes, _seen) for codes in value.codes))
+    if isinstance(value, pd.Index):
+        return _array_nbytes(value.array, _seen)
+    if isinstance(value, np.ndarray):
+        return _array_nbytes(value, _seen)
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sum(estimate_nbytes(item, _seen) for item in value.values())
+    if isinstance(value, (list, tuple, set)):
+        return sum(estimate_nbytes(item, _seen) for item in value)
+    if hasattr(value, '__dict__'):
+        return estimate_nbytes(vars(value), _seen)
+    return 64
+
+
+class _Entry(NamedTuple):
+    value: object
+    nbytes: int
+    build_seconds: float
+
+
+class MemoryBudgetCache:
+    """
+    Thread-safe LRU cache of (namespace, kind, key) entries under a byte
+    budget shared by all namespaces. Concurrent requests for the same missing
+    entry build it once.
+
+    Entries a build reads from the cache (e.g. the query backend an aggregate
+    is computed from) are pinned until that build's result is stored, so a
+    budget too small for both never evicts the backend that is being served.
+    """
+
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.used_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._build_locks = {}
+        # Entry key -> number of in-progress builds that read it
+        self._pins = Counter()
+        # Per thread: a list of the entry keys read by each in-progress build
+        self._local = threading.local()
+
+    def keys(self, namespace, kind):
+        """
+        Keys of the entries currently held for one namespace and kind.
+        """
+        with self._lock:
+            return [key for entry_namespace, entry_kind, key in self._entries
+                    if entry_namespace == namespace and entry_kind == kind]
+
+    def get(self, namespace, kind, key, build):
+        entry_key = (namespace, kind, key)
+        with self._lock:
+            if entry_key in self._entries:
+                self._pin_for_caller(entry_key)
+                return self._hit(entry_key)
+            build_lock = self._build_locks.setdefault(entry_key, threading.Lock())
+
+        with build_lock:
+            with self._lock:
+                if entry_key in self._entries:
+                    self._pin_for_caller(entry_key)
+                    return self._hit(entry_key)
+
+            builds = self._builds()
+            builds.append([])
+            try:
+                start = time.perf_counter()
+                value = build()
+                entry = _Entry(value, estimate_nbytes(value), time.perf_counter() - start)
+
+                with self._lock:
+                    self.misses += 1
+                    self._entries[entry_key] = entry
+                    self.used_bytes += entry.nbytes
+                    if entry.nbytes > self.budget_bytes:
+                        logger.warning("%s/%s alone (%.1f MB) exceeds the %.0f MB cache budget",
+                                       namespace, kind, self._mb(entry.nbytes), self._mb(self.budget_bytes))
+                    self._evict(keep=entry_key)
+                    self._build_locks.pop(entry_key, None)
+            finally:
+                with self._lock:
+                    for read_key in builds.pop():
+                        self._pins[read_key] -= 1
+                        if not self._pins[read_key]:
+                            del self._pins[read_key]
+                    self._pin_for_caller(entry_key)
+        return value
+
+    def _builds(self):
+        if not hasattr(self._local, 'builds'):
+            self._local.builds = []
+        return self._local.builds
+
+    def _pin_for_caller(self, entry_key):
+        """
+        Pin an entry read inside another entry's build until that build ends.
+        """
+        builds = self._builds()
+        if builds:
+            builds[-1].append(entry_key)
+            self._pins[entry_key] += 1
+
+    def peek(self, namespace, kind, key):
+        """
+        A cached value without building it or touching its recency, else None.
+        """
+        with self._lock:
+            entry = self._entries.get((namespace, kind, key))
+        return entry.value if entry is not None else None
+
+    def _hit(self, entry_key):
+        self.hits += 1
+        self._entries.move_to_end(entry_key)
+        return self._entries[entry_key].value
+
+    def _evict(self, keep):
+        for entry_key in list(self._entries):
+            if self.used_bytes <= self.budget_bytes:
+                break
+            if entry_key != keep and entry_key not in self._pins:
+                self._remove(entry_key)
+                self.evictions += 1
+                logger.info("Evicted %s/%s (%.1f MB) to stay within the %.0f MB cache budget",
+                            entry_key[0], entry_key[1], self._mb(self.used_bytes), self._mb(self.budget_bytes))
+
+    def _remove(self, entry_key):
+        self.used_bytes -= self._entries.pop(entry_key).nbytes
+
+    def drop(self, namespace, keep=None):
+        """
+        Remove a namespace's entries, except those for which keep(kind, key) is true.
+        """
+        with self._lock:
+            for entry_key in [k for k in self._entries if k[0] == namespace]:
+                if keep is None or not keep(entry_key[1], entry_key[2]):
+                    self._remove(entry_key)
+
+    def namespaces(self):
+        with self._lock:
+            return list(dict.fromkeys(namespace for namespace, _, _ in reversed(self._entries)))
+
+    def usage(self):
+        """
+        Entries and memory per namespace and kind, most recently used first.
+        """
+        with self._lock:
+            rows = [(namespace, kind, entry.nbytes, entry.build_seconds)
+                    for (namespace, kind, _), entry in reversed(self._entries.items())]
+        usage = pd.DataFrame(rows, columns=['Dataset', 'Cache', 'Bytes', 'Build s'])
+        usage = usage.groupby(['Dataset', 'Cache'], sort=False).agg(
+            Entries=('Bytes', 'size'), MB=('Bytes', 'sum'), **{'Build s': ('Build s', 'sum')})
+        usage['MB'] = usage['MB'] / 2 ** 20
+        return usage.reset_index()
+
+    def summary(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'used_mb': self._mb(self.used_bytes),
+                    'budget_mb': self._mb(self.budget_bytes), 'hits': self.hits,
+                    'misses': self.misses, 'evictions': self.evictions}
+
+    @staticmethod
+    def _mb(n_bytes):
+        return n_bytes / 2 ** 20
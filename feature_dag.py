@@ -0,0 +1,295 @@
+"""
+Dependency-tracked feature engineering.
+
+Every engineered feature is declared with the columns it reads and the
+parameters it uses (severity keywords, bins, ...). The DAG runs the features
+in dependency order and, given a cache, keys each feature's output on a
+fingerprint of its inputs and parameters: source columns are fingerprinted by
+content, derived columns by the key that produced them. A changed source
+column or parameter therefore recomputes only the features downstream of it;
+everything else is reused. The DAG and per-feature timings can be inspected
+for profiling (describe, downstream).
+
+Work split across processes can share one cache: a worker computes the keys
+of its rows (keys), skips the features its parent already holds
+(cached_keys, skip) and the parent fills them in (present).
+"""
+
+import hashlib
+import threading
+import time
+from typing import Callable, NamedTuple
+
+import pandas as pd
+
+STAGES = ('row', 'global')
+
+# Where feature outputs live in a MemoryBudgetCache-style cache
+CACHE_NAMESPACE = 'features'
+CACHE_KIND = 'features'
+
+
+class Feature(NamedTuple):
+    """
+    One node of the DAG. compute(frame, **params, **context) gets a frame of
+    just the declared inputs and returns a Series (the column called name),
+    or a DataFrame with the declared outputs. context values (e.g. partial
+    results merged from partitions) are passed through but not fingerprinted:
+    they must be derivable from the inputs.
+
+    Row-stage features only read their own row; global-stage features need
+    whole columns and run once over the merged rows.
+    """
+    name: str
+    inputs: tuple
+    compute: Callable
+    params: tuple = ()
+    outputs: tuple = ()
+    stage: str = 'row'
+    context: tuple = ()
+
+    @property
+    def columns(self):
+        return self.outputs or (self.name,)
+
+
+def fingerprint_column(values):
+    """
+    Content fingerprint of a column (order-sensitive, index ignored).
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(values.dtype).encode())
+    if values.dtype.kind in 'biufcmM':
+        digest.update(values.to_numpy().tobytes())
+    else:
+        digest.update(pd.util.hash_pandas_object(values, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+class FeatureDAG:
+    """
+    Named features with declared inputs, computed in dependency order.
+    """
+
+    def __init__(self, defaults=None):
+        self.defaults = dict(defaults or {})
+        self.features = {}
+        self._order = None
+        self._stats_lock = threading.Lock()
+        self.stats = {}
+
+    def feature(self, name, inputs, params=(), outputs=(), stage='row', context=()):
+        """
+        Decorator declaring a feature computed by the decorated function.
+        """
+        if stage not in STAGES:
+            raise ValueError(f"Unknown stage '{stage}'. Choose from: {', '.join(STAGES)}")
+
+        def register(compute):
+            if name in self.features:
+                raise ValueError(f"Feature '{name}' is already declared")
+            self.features[name] = Feature(name, tuple(inputs), compute, tuple(params), tuple(outputs), stage,
+                                          tuple(context))
+            self.stats[name] = {'computed': 0, 'reused': 0, 'seconds': None}
+            self._order = None
+            return compute
+
+        return register
+
+    def producers(self):
+        """
+        {column: name of the feature that produces it}.
+        """
+        return {col: feature.name for feature in self.features.values() for col in feature.columns}
+
+    def dependencies(self, name):
+        """
+        Features whose outputs the given feature reads directly.
+        """
+        producers = self.producers()
+        return list(dict.fromkeys(producers[col] for col in self.features[name].inputs if col in producers))
+
+    @property
+    def order(self):
+        """
+        Feature names in dependency order (declaration order where free).
+        """
+        if self._order is None:
+            order, state = [], {}
+
+            def visit(name, path):
+                if state.get(name) == 'done':
+                    return
+                if state.get(name) == 'visiting':
+                    raise ValueError(f"Feature dependency cycle: {' -> '.join(path + [name])}")
+                state[name] = 'visiting'
+                for dependency in self.dependencies(name):
+                    visit(dependency, path + [name])
+                state[name] = 'done'
+                order.append(name)
+
+            for name in self.features:
+                visit(name, [])
+            self._order = order
+        return self._order
+
+    def upstream(self, names):
+        """
+        The given features and every feature they read from, directly or not.
+        """
+        result, pending = set(), list(names)
+        while pending:
+            name = pending.pop()
+            if name not in result:
+                result.add(name)
+                pending.extend(self.dependencies(name))
+        return result
+
+    def downstream(self, changed):
+        """
+        Features (in dependency order) recomputed when the given source
+        columns, feature outputs or parameters change.
+        """
+        dirty_columns = set(changed)
+        affected = []
+        for name in self.order:
+            feature = self.features[name]
+            if dirty_columns & set(feature.inputs + feature.params) or name in dirty_columns:
+                affected.append(name)
+                dirty_columns.update(feature.columns)
+        return affected
+
+    def source_columns(self):
+        producers = self.producers()
+        return list(dict.fromkeys(col for name in self.order for col in self.features[name].inputs
+                                  if col not in producers))
+
+    def describe(self):
+        """
+        One row per feature in dependency order: stage, inputs, parameters,
+        outputs, how many features depend on it, and its compute and reuse
+        counts and last compute time.
+        """
+        rows = []
+        for name in self.order:
+            feature = self.features[name]
+            stats = self.stats[name]
+            rows.append({
+                'Feature': name,
+                'Stage': feature.stage,
+                'Inputs': ', '.join(feature.inputs),
+                'Params': ', '.join(feature.params),
+                'Outputs': ', '.join(feature.columns),
+                'Downstream': len([other for other in self.downstream(feature.columns) if other != name]),
+                'Computed': stats['computed'],
+                'Reused': stats['reused'],
+                'Last s': stats['seconds'],
+            })
+        return pd.DataFrame(rows).astype({'Last s': float})
+
+    def _key(self, feature, fingerprints, df, params):
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(feature.name.encode())
+        for col in feature.inputs:
+            if col not in fingerprints:
+                fingerprints[col] = fingerprint_column(df[col])
+            digest.update(fingerprints[col].encode())
+        for param in feature.params:
+            digest.update(repr(params[param]).encode())
+        return digest.hexdigest()
+
+    def _params(self, params):
+        unknown = set(params or {}) - set(self.defaults)
+        if unknown:
+            raise ValueError(f"Unknown feature parameters: {', '.join(sorted(unknown))}. "
+                             f"Choose from: {', '.join(self.defaults)}")
+        return {**self.defaults, **(params or {})}
+
+    def _stage_order(self, stage):
+        return [name for name in self.order if stage is None or self.features[name].stage == stage]
+
+    def keys(self, df, stage=None, params=None):
+        """
+        {feature: cache key} for the features of one stage (all if None),
+        from content fingerprints of df's source columns.
+        """
+        params = self._params(params)
+        fingerprints, keys = {}, {}
+        for name in self._stage_order(stage):
+            feature = self.features[name]
+            keys[name] = self._key(feature, fingerprints, df, params)
+            fingerprints.update({col: f'{keys[name]}:{col}' for col in feature.columns})
+        return keys
+
+    @staticmethod
+    def cached_keys(cache):
+        """
+        The (feature, key) pairs a cache currently holds; the cache must also
+        provide keys(namespace, kind) (MemoryBudgetCache does).
+        """
+        return frozenset(cache.keys(CACHE_NAMESPACE, CACHE_KIND))
+
+    def skip(self, keys, cached_keys):
+        """
+        Features whose outputs are held in cached_keys and are not needed to
+        compute any feature that is not: a worker can leave them out.
+        """
+        cached = {name for name, key in keys.items() if (name, key) in cached_keys}
+        return cached - self.upstream(set(keys) - cached)
+
+    def compute(self, df, stage=None, params=None, cache=None, context=None, keys=None, skip=(), present=()):
+        """
+        Add the features of one stage (all stages if None) to df, in place.
+
+        params override the defaults. cache is a MemoryBudgetCache-style
+        object (get(namespace, kind, key, build)); without one every feature
+        is computed and nothing is fingerprinted; with one, df gets copies of
+        the cached outputs. keys (see keys) saves fingerprinting df again.
+        Features in skip are left out; features in present were already
+        computed into df (e.g. by a worker) and only a copy is stored in the
+        cache.
+        """
+        params = self._params(params)
+        context = context or {}
+        if cache is not None and keys is None:
+            keys = self.keys(df, stage, params)
+
+        for name in self._stage_order(stage):
+            if name in skip:
+                continue
+            feature = self.features[name]
+            start = time.perf_counter()
+            built = []
+
+            def build():
+                built.append(True)
+                if name in present:
+                    return {col: df[col].copy() for col in feature.columns}
+                result = feature.compute(
+                    df[list(feature.inputs)],
+                    **{param: params[param] for param in feature.params},
+                    **{key: context[key] for key in feature.context if key in context}
+                )
+                if isinstance(result, pd.Series):
+                    result = result.to_frame(name)
+                return {col: result[col] for col in feature.columns}
+
+            if cache is None:
+                outputs = build()
+            else:
+                outputs = cache.get(CACHE_NAMESPACE, CACHE_KIND, (name, keys[name]), build)
+
+            if name not in present:
+                for col, values in outputs.items():
+                    # The frame never shares the cached buffers: the memory
+                    # budget counts the cache entries and the frame separately
+                    df[col] = values.array.copy() if cache is not None else values.array
+            with self._stats_lock:
+                stats = self.stats[name]
+                if name in present or built:
+                    stats['computed'] += 1
+                if built and name not in present:
+                    stats['seconds'] = time.perf_counter() - start
+                if not built and name not in present:
+                    stats['reused'] += 1
+        return df
@@ -0,0 +1,266 @@
+"""
+Command-line access to the injury dataset for pipelines and notebooks.
+
+Runs the same preprocessing and filters as the dashboard without a browser
+or a Streamlit server.
+
+Usage:
+    python injury_cli.py export --format parquet --compression zstd \
+        --team Arsenal --team Chelsea --season 2021/22 \
+        --columns Name "Team Name" Injury Injury_Duration_Days -o arsenal.parquet
+    python injury_cli.py export --format csv -o - | head
+    python injury_cli.py validate --data new_season.csv --max-issue-rate 0.05
+    python injury_cli.py preprocess --data history/*.csv --workers 16 -o history.engineered.parquet
+    python injury_cli.py features --changed severe_keywords Injury
+    python injury_cli.py features --profile
+"""
+
+import argparse
+import sys
+
+from data_quality import DEFAULT_THRESHOLDS, ISSUE_TYPES, DataQualityError, parse_and_validate
+from injury_data import (
+    DEFAULT_DATA_PATH, DEFAULT_EXPORT_COLUMNS, EXPORT_FORMATS, FilterState,
+    build_range_indexes, export_bytes, filter_injuries, load_and_preprocess,
+    project_for_export, select_range_rows
+)
+
+
+def add_filter_arguments(parser):
+    parser.add_argument('--data', default=DEFAULT_DATA_PATH, help="Source injury CSV")
+    parser.add_argument('--team', action='append', dest='teams', help="Team filter (repeatable)")
+    parser.add_argument('--season', action='append', dest='seasons', help="Season filter (repeatable)")
+    parser.add_argument('--severity', action='append', dest='severities', help="Severity filter (repeatable)")
+    parser.add_argument('--position', action='append', dest='positions', help="Position filter (repeatable)")
+    parser.add_argument('--age-group', action='append', dest='age_groups', help="Age group filter (repeatable)")
+    parser.add_argument('--date-from', default=None, help="Earliest Date of Injury (inclusive)")
+    parser.add_argument('--date-to', default=None, help="Latest Date of Injury (inclusive)")
+    parser.add_argument('--min-rating', type=float, default=None, help="Minimum FIFA rating")
+    parser.add_argument('--max-rating', type=float, default=None, help="Maximum FIFA rating")
+    parser.add_argument('--min-age', type=float, default=None, help="Minimum age")
+    parser.add_argument('--max-age', type=float, default=None, help="Maximum age")
+    parser.add_argument('--min-days', type=float, default=None, help="Minimum injury duration in days")
+    parser.add_argument('--max-days', type=float, default=None, help="Maximum injury duration in days")
+
+
+def requested_ranges(args):
+    bounds = {
+        'Date of Injury': (args.date_from, args.date_to),
+        'FIFA rating': (args.min_rating, args.max_rating),
+        'Age': (args.min_age, args.max_age),
+        'Injury_Duration_Days': (args.min_days, args.max_days),
+    }
+    return {col: (low, high) for col, (low, high) in bounds.items() if low is not None or high is not None}
+
+
+def load_filtered(args):
+    df = load_validated(args)
+    ranges = requested_ranges(args)
+    return filter_injuries(
+        df,
+        row_positions=select_range_rows(build_range_indexes(df, list(ranges)), ranges),
+        teams=args.teams,
+        seasons=args.seasons,
+        severities=args.severities,
+        positions=args.positions,
+        age_groups=args.age_groups
+    )
+
+
+def command_export(args):
+    df_filtered = load_filtered(args)
+
+    columns = args.columns or DEFAULT_EXPORT_COLUMNS
+    if args.all_columns:
+        columns = df_filtered.columns.tolist()
+    unknown = [col for col in columns if col not in df_filtered.columns]
+    if unknown:
+        sys.exit(f"Unknown columns: {', '.join(unknown)}")
+
+    compression = None if args.compression == 'none' else args.compression
+    if args.compression is None:
+        compression = EXPORT_FORMATS[args.format][2][0]
+
+    try:
+        payload = export_bytes(project_for_export(df_filtered, columns), args.format, compression=compression)
+    except ValueError as e:
+        sys.exit(str(e))
+
+    if args.output == '-':
+        sys.stdout.buffer.write(payload)
+    else:
+        with open(args.output, 'wb') as out:
+            out.write(payload)
+        print(f"Wrote {len(df_filtered)} rows x {len(columns)} columns to {args.output}", file=sys.stderr)
+
+
+def command_check_backends(args):
+    from query_backend import PandasBackend, compare_backends, open_backend
+
+    pandas_backend = PandasBackend(load_validated(args))
+    try:
+        duckdb_backend = open_backend('duckdb', args.data, args.parquet, quality_thresholds=requested_thresholds(args))
+    except DataQualityError as e:
+        exit_on_quality_error(e)
+
+    states = [FilterState()]
+    for team in pandas_backend.options('Team Name'):
+        states.append(FilterState(teams=(team,)))
+    for season in pandas_backend.options('Season'):
+        states.append(FilterState(seasons=(season,), severities=('Severe', 'Moderate')))
+    states.append(FilterState(ranges=(('FIFA rating', 80, None), ('Injury_Duration_Days', 60, None))))
+    states.append(FilterState(teams=()))
+
+    mismatches = compare_backends(pandas_backend, duckdb_backend, states)
+    for mismatch in mismatches:
+        print(mismatch, file=sys.stderr)
+    print(f"Checked {len(states)} filter states: {len(mismatches)} mismatches")
+    sys.exit(1 if mismatches else 0)
+
+
+def requested_thresholds(args):
+    thresholds = dict(DEFAULT_THRESHOLDS)
+    if args.max_issue_rate is not None:
+        thresholds = {issue: args.max_issue_rate for issue in ISSUE_TYPES}
+    for issue, rate in args.threshold or []:
+        if issue not in ISSUE_TYPES:
+            sys.exit(f"Unknown issue type '{issue}'. Choose from: {', '.join(ISSUE_TYPES)}")
+        thresholds[issue] = float(rate)
+    return thresholds
+
+
+def add_threshold_arguments(parser):
+    parser.add_argument('--max-issue-rate', type=float, default=None,
+                        help="Largest tolerated share of affected rows for every issue type")
+    parser.add_argument('--threshold', nargs=2, action='append', metavar=('ISSUE', 'RATE'),
+                        help=f"Threshold for one issue type ({', '.join(ISSUE_TYPES)}; repeatable)")
+
+
+def exit_on_quality_error(error):
+    print(error.report.sample_frame().to_string(index=False), file=sys.stderr)
+    sys.exit(str(error))
+
+
+def load_validated(args):
+    """
+    load_and_preprocess(args.data) under the requested quality thresholds;
+    a file over them exits with the sample rows instead of a traceback.
+    """
+    try:
+        return load_and_preprocess(args.data, quality_thresholds=requested_thresholds(args))
+    except DataQualityError as e:
+        exit_on_quality_error(e)
+
+
+def command_validate(args):
+    import pandas as pd
+
+    thresholds = requested_thresholds(args)
+
+    try:
+        _, report = parse_and_validate(pd.read_csv(args.data), thresholds=thresholds, sample_size=args.samples)
+    except DataQualityError as e:
+        report = e.report
+        print(e, file=sys.stderr)
+
+    if args.json:
+        print(report.to_json())
+    else:
+        print(report.summary().to_string(index=False))
+        samples = report.sample_frame()
+        if not samples.empty:
+            print()
+            print(samples.to_string(index=False))
+    sys.exit(0 if report.passed else 1)
+
+
+def command_preprocess(args):
+    import time
+
+    from parallel_preprocess import load_and_preprocess_parallel
+    from query_backend import write_engineered_parquet
+
+    start = time.perf_counter()
+    try:
+        df, report = load_and_preprocess_parallel(args.data, args.workers, quality_thresholds=requested_thresholds(args),
+                                                  with_report=True)
+    except DataQualityError as e:
+        exit_on_quality_error(e)
+    write_engineered_parquet(df, args.output, report)
+    print(f"Engineered {len(df)} rows from {len(args.data)} file(s) in {time.perf_counter() - start:.1f}s "
+          f"-> {args.output}", file=sys.stderr)
+
+
+def command_features(args):
+    from injury_data import FEATURES
+
+    if args.changed:
+        unknown = set(args.changed) - set(FEATURES.defaults) - set(FEATURES.source_columns()) - \
+                  set(FEATURES.producers()) - set(FEATURES.features)
+        if unknown:
+            sys.exit(f"Unknown columns, features or parameters: {', '.join(sorted(unknown))}")
+        print('\n'.join(FEATURES.downstream(args.changed)))
+        return
+
+    columns = ['Feature', 'Stage', 'Inputs', 'Params', 'Downstream']
+    if args.profile:
+        load_and_preprocess(args.data)
+        columns.append('Last s')
+    print(FEATURES.describe()[columns].to_string(index=False, max_colwidth=60))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Football Injury Impact data tools.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = subparsers.add_parser('export', help="Export the filtered dataset")
+    add_filter_arguments(export_parser)
+    export_parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='parquet')
+    export_parser.add_argument('--compression', default=None,
+                               help="Codec for parquet/arrow ('none' disables; default is the format's first codec)")
+    export_parser.add_argument('--columns', nargs='+', default=None, help="Columns to export (projection)")
+    export_parser.add_argument('--all-columns', action='store_true', help="Export every column")
+    add_threshold_arguments(export_parser)
+    export_parser.add_argument('-o', '--output', required=True, help="Output file, or '-' for stdout")
+    export_parser.set_defaults(func=command_export)
+
+    check_parser = subparsers.add_parser('check-backends',
+                                         help="Verify the pandas and DuckDB backends return identical results")
+    check_parser.add_argument('--data', default=DEFAULT_DATA_PATH, help="Source injury CSV")
+    check_parser.add_argument('--parquet', default=None, help="Engineered Parquet file for DuckDB (built if omitted)")
+    add_threshold_arguments(check_parser)
+    check_parser.set_defaults(func=command_check_backends)
+
+    validate_parser = subparsers.add_parser('validate', help="Report data-quality issues in an injury CSV")
+    validate_parser.add_argument('--data', default=DEFAULT_DATA_PATH, help="Source injury CSV")
+    add_threshold_arguments(validate_parser)
+    validate_parser.add_argument('--samples', type=int, default=5, help="Sample rows per issue type")
+    validate_parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+    validate_parser.set_defaults(func=command_validate)
+
+    preprocess_parser = subparsers.add_parser(
+        'preprocess', help="Engineer one or many CSV files in parallel into a Parquet file for the DuckDB backend")
+    preprocess_parser.add_argument('--data', nargs='+', required=True, help="Source injury CSVs, merged in order")
+    preprocess_parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: all cores)")
+    add_threshold_arguments(preprocess_parser)
+    preprocess_parser.add_argument('-o', '--output', required=True, help="Engineered Parquet file")
+    preprocess_parser.set_defaults(func=command_preprocess)
+
+    features_parser = subparsers.add_parser('features', help="Show the engineered-feature DAG")
+    features_parser.add_argument('--changed', nargs='+', default=None, metavar='NAME',
+                                 help="Source columns, features or parameters; list the features they recompute")
+    features_parser.add_argument('--profile', action='store_true',
+                                 help="Engineer --data once and show each feature's compute time")
+    features_parser.add_argument('--data', default=DEFAULT_DATA_PATH, help="Source injury CSV for --profile")
+    features_parser.set_defaults(func=command_features)
+
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
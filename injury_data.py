@@ -0,0 +1,459 @@
+"""
+Data layer for the Football Injury Impact Dashboard.
+
+Loading, preprocessing, filtering and export serialisation live here, free of
+Streamlit, so the same code serves the dashboard (through data_cache.py, which
+keeps each registered dataset's results in a memory-budgeted cache) and
+headless pipelines (injury_cli.py).
+"""
+
+from io import BytesIO
+from typing import NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+from data_quality import KNOWN_CLUBS, parse_and_validate
+from feature_dag import FeatureDAG
+from opponent_strength import ADJUSTED_GD_COLUMNS, RATING_INPUT_COLUMNS, fit_ratings, opponent_adjusted_gd, solve_ratings
+
+DEFAULT_DATA_PATH = 'player_injuries_impact.csv'
+
+# Bump when load_and_preprocess adds or changes engineered columns, so cached
+# engineered Parquet files from an older pipeline are rebuilt
+PIPELINE_VERSION = 3
+
+SEVERITY_LEVELS = ['Minor', 'Moderate', 'Severe']
+
+AGE_GROUP_BINS = [0, 23, 26, 29, 40]
+AGE_GROUP_LABELS = ['Young (≤23)', 'Prime (24-26)', 'Experienced (27-29)', 'Veteran (30+)']
+
+PERFORMANCE_BINS = [0, 75, 80, 85, 100]
+PERFORMANCE_LABELS = ['Average', 'Good', 'Very Good', 'Elite']
+
+SEVERE_KEYWORDS = ['cruciate', 'acl', 'meniscus', 'fracture', 'rupture', 'tear', 'ligament']
+MODERATE_KEYWORDS = ['hamstring', 'groin', 'calf', 'shoulder', 'ankle', 'strain']
+
+# Feature parameters (overridable per load; see FEATURES below)
+FEATURE_PARAMS = {
+    'severe_keywords': SEVERE_KEYWORDS,
+    'moderate_keywords': MODERATE_KEYWORDS,
+    'age_group_bins': AGE_GROUP_BINS,
+    'age_group_labels': AGE_GROUP_LABELS,
+    'performance_bins': PERFORMANCE_BINS,
+    'performance_labels': PERFORMANCE_LABELS,
+}
+
+# Columns offered as sidebar range filters, served from presorted indexes
+RANGE_FILTER_COLUMNS = ['Date of Injury', 'FIFA rating', 'Age', 'Injury_Duration_Days']
+
+DEFAULT_EXPORT_COLUMNS = ['Name', 'Team Name', 'Position', 'Age', 'Injury', 'Injury_Severity',
+                          'Injury_Duration_Days', 'Performance_Drop_Index', 'Team_Performance_Drop']
+
+# Format key -> (file extension, MIME type, supported compression codecs)
+EXPORT_FORMATS = {
+    'csv': ('csv', 'text/csv', [None]),
+    'excel': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', [None]),
+    'json': ('json', 'application/json', [None]),
+    'parquet': ('parquet', 'application/vnd.apache.parquet', ['snappy', 'zstd', 'gzip', 'brotli', None]),
+    'arrow': ('arrow', 'application/vnd.apache.arrow.file', ['zstd', 'lz4', None]),
+}
+
+
+# ============================================================================
+# LOADING & PREPROCESSING
+# ============================================================================
+def load_and_preprocess(data_path=DEFAULT_DATA_PATH, known_teams=KNOWN_CLUBS, quality_thresholds=None,
+                        with_report=False, feature_params=None, feature_cache=None):
+    """
+    Advanced data preprocessing pipeline with comprehensive feature engineering.
+
+    The date, rating and GD columns are parsed and validated in one vectorised
+    pass (data_quality.py); a file whose issues exceed quality_thresholds
+    raises DataQualityError. with_report=True also returns the QualityReport.
+    Large or many-file loads can run on several cores with
+    parallel_preprocess.load_and_preprocess_parallel.
+
+    The engineered columns come from the FEATURES DAG. feature_params
+    override FEATURE_PARAMS; with a feature_cache, only features whose
+    inputs or parameters changed since an earlier load are recomputed.
+    """
+    df, quality_report = preprocess_rows(pd.read_csv(data_path), known_teams, quality_thresholds,
+                                         feature_params=feature_params, feature_cache=feature_cache)
+    df = finalize_features(df, feature_params=feature_params, feature_cache=feature_cache)
+
+    if with_report:
+        return df, quality_report
+    return df
+
+
+def preprocess_rows(df, known_teams=KNOWN_CLUBS, quality_thresholds=None, date_formats=None, feature_params=None,
+                    feature_cache=None):
+    """
+    The row-local part of the pipeline: parsing, validation and the
+    row-stage features. Any slice of the rows can be processed independently;
+    finalize_features completes the merged result.
+
+    Returns (frame, QualityReport). A partition of a larger load passes
+    quality_thresholds={} to collect its report without failing, and the
+    whole load's date_formats (data_quality.infer_date_formats).
+    """
+    df, quality_report = parse_rows(df, known_teams, quality_thresholds, date_formats)
+    df = FEATURES.compute(df, stage='row', params=feature_params, cache=feature_cache)
+    return df, quality_report
+
+
+def parse_rows(df, known_teams=KNOWN_CLUBS, quality_thresholds=None, date_formats=None):
+    """
+    Date, rating and GD parsing with validation: the part of preprocess_rows
+    before the row-stage features. Returns (frame, QualityReport).
+    """
+    parsed, quality_report = parse_and_validate(df, known_teams, quality_thresholds, date_formats=date_formats)
+    for col, values in parsed.items():
+        df[col] = values
+    return df, quality_report
+
+
+def finalize_features(df, rating_observations=None, feature_params=None, feature_cache=None):
+    """
+    The global part of the pipeline, run once over all rows: the global-stage
+    features, which need whole-column statistics (median imputation, opponent
+    ratings), then median imputation of every numeric column.
+    rating_observations, when given, are the merged
+    opponent_strength.rating_observations of the partitions.
+    """
+    df = FEATURES.compute(df, stage='global', params=feature_params, cache=feature_cache,
+                          context={'rating_observations': rating_observations})
+
+    # Missing value handling
+    numeric_cols = df.select_dtypes(include=[np.number]).columns
+    for col in numeric_cols:
+        if df[col].hasnans:
+            df[col] = df[col].fillna(df[col].median())
+
+    return df
+
+
+# ============================================================================
+# FEATURES
+# ============================================================================
+# Every engineered column, declared with the columns and parameters it reads.
+# Print FEATURES.describe() (or run `python injury_cli.py features`) to see
+# the graph and per-feature timings.
+FEATURES = FeatureDAG(FEATURE_PARAMS)
+
+BEFORE_RATING_COLS = ['Match1_before_injury_Player_rating', 'Match2_before_injury_Player_rating', 'Match3_before_injury_Player_rating']
+AFTER_RATING_COLS = ['Match1_after_injury_Player_rating', 'Match2_after_injury_Player_rating', 'Match3_after_injury_Player_rating']
+
+MISSED_GD_COLS = ['Match1_missed_match_GD', 'Match2_missed_match_GD', 'Match3_missed_match_GD']
+BEFORE_GD_COLS = ['Match1_before_injury_GD', 'Match2_before_injury_GD', 'Match3_before_injury_GD']
+AFTER_GD_COLS = ['Match1_after_injury_GD', 'Match2_after_injury_GD', 'Match3_after_injury_GD']
+
+BEFORE_RESULT_COLS = ['Match1_before_injury_Result', 'Match2_before_injury_Result', 'Match3_before_injury_Result']
+MISSED_RESULT_COLS = ['Match1_missed_match_Result', 'Match2_missed_match_Result', 'Match3_missed_match_Result']
+
+
+@FEATURES.feature('Injury_Calendar', inputs=['Date of Injury'],
+                  outputs=['Injury_Month', 'Injury_Year', 'Injury_Month_Name', 'Injury_Quarter', 'Injury_Week'])
+def _injury_calendar(df):
+    dates = df['Date of Injury'].dt
+    return pd.DataFrame({
+        'Injury_Month': dates.month,
+        'Injury_Year': dates.year,
+        'Injury_Month_Name': dates.strftime('%B'),
+        'Injury_Quarter': dates.quarter,
+        'Injury_Week': dates.isocalendar().week,
+    })
+
+
+@FEATURES.feature('Avg_Rating_Before_Injury', inputs=BEFORE_RATING_COLS)
+def _avg_rating_before(df):
+    return df.mean(axis=1)
+
+
+@FEATURES.feature('Avg_Rating_After_Injury', inputs=AFTER_RATING_COLS)
+def _avg_rating_after(df):
+    return df.mean(axis=1)
+
+
+@FEATURES.feature('Performance_Drop_Index', inputs=['Avg_Rating_Before_Injury', 'Avg_Rating_After_Injury'])
+def _performance_drop(df):
+    return df['Avg_Rating_Before_Injury'] - df['Avg_Rating_After_Injury']
+
+
+@FEATURES.feature('Performance_Recovery_Rate', inputs=['Performance_Drop_Index', 'Avg_Rating_Before_Injury'])
+def _performance_recovery_rate(df):
+    return (df['Performance_Drop_Index'] / (df['Avg_Rating_Before_Injury'] + 0.001)) * 100
+
+
+@FEATURES.feature('Avg_GD_Before', inputs=BEFORE_GD_COLS)
+def _avg_gd_before(df):
+    return df.mean(axis=1)
+
+
+@FEATURES.feature('Team_Performance_During_Absence', inputs=MISSED_GD_COLS)
+def _avg_gd_during(df):
+    return df.mean(axis=1)
+
+
+@FEATURES.feature('Avg_GD_After', inputs=AFTER_GD_COLS)
+def _avg_gd_after(df):
+    return df.mean(axis=1)
+
+
+@FEATURES.feature('Team_Performance_Drop', inputs=['Avg_GD_Before', 'Team_Performance_During_Absence'])
+def _team_performance_drop(df):
+    return df['Avg_GD_Before'] - df['Team_Performance_During_Absence']
+
+
+@FEATURES.feature('Win_Ratio_Before', inputs=BEFORE_RESULT_COLS)
+def _win_ratio_before(df):
+    return (df == 'win').astype(int).sum(axis=1)
+
+
+@FEATURES.feature('Win_Ratio_During', inputs=MISSED_RESULT_COLS)
+def _win_ratio_during(df):
+    return (df == 'win').astype(int).sum(axis=1)
+
+
+@FEATURES.feature('Injury_Severity', inputs=['Injury'], params=['severe_keywords', 'moderate_keywords'])
+def _injury_severity(df, severe_keywords, moderate_keywords):
+    severe_keywords = [keyword.lower() for keyword in severe_keywords]
+    moderate_keywords = [keyword.lower() for keyword in moderate_keywords]
+
+    def categorize_severity(injury_type):
+        injury_lower = str(injury_type).lower()
+        for keyword in severe_keywords:
+            if keyword in injury_lower:
+                return 'Severe'
+        for keyword in moderate_keywords:
+            if keyword in injury_lower:
+                return 'Moderate'
+        return 'Minor'
+
+    return df['Injury'].apply(categorize_severity)
+
+
+@FEATURES.feature('Team_Impact_Severity', inputs=['Team_Performance_Drop', 'Injury_Severity'])
+def _team_impact_severity(df):
+    return abs(df['Team_Performance_Drop']) * np.where(df['Injury_Severity'] == 'Severe', 1.5,
+                                                       np.where(df['Injury_Severity'] == 'Moderate', 1.0, 0.7))
+
+
+@FEATURES.feature('Age_Group', inputs=['Age'], params=['age_group_bins', 'age_group_labels'])
+def _age_group(df, age_group_bins, age_group_labels):
+    return pd.cut(df['Age'], bins=age_group_bins, labels=age_group_labels)
+
+
+@FEATURES.feature('Performance_Category', inputs=['FIFA rating'], params=['performance_bins', 'performance_labels'])
+def _performance_category(df, performance_bins, performance_labels):
+    return pd.cut(df['FIFA rating'], bins=performance_bins, labels=performance_labels)
+
+
+@FEATURES.feature('Injury_Duration_Days', inputs=['Date of Injury', 'Date of return'], stage='global')
+def _injury_duration(df):
+    days = (df['Date of return'] - df['Date of Injury']).dt.days
+    return days.fillna(days.median())
+
+
+@FEATURES.feature('Recovery_Index', inputs=['Injury_Duration_Days'], stage='global')
+def _recovery_index(df):
+    return df['Injury_Duration_Days'] / 100
+
+
+# Opponent-strength adjusted GD (opponent_strength.py). A parallel load passes
+# the rating observations merged from its partitions instead of rescanning.
+@FEATURES.feature('Opponent_Adjusted_GD', inputs=RATING_INPUT_COLUMNS, stage='global',
+                  outputs=list(ADJUSTED_GD_COLUMNS.values()) + ['Adj_Team_Performance_Drop'],
+                  context=['rating_observations'])
+def _opponent_adjusted(df, rating_observations=None):
+    ratings = fit_ratings(df) if rating_observations is None else solve_ratings(rating_observations)
+    return opponent_adjusted_gd(df, ratings)
+
+
+# ============================================================================
+# FILTERING
+# ============================================================================
+class FilterState(NamedTuple):
+    """
+    Hashable snapshot of the sidebar filters, shared by every query backend.
+
+    Categorical filters are tuples of selected values (None = not applied);
+    ranges is a tuple of (column, low, high) with inclusive, optional bounds.
+    """
+    teams: Optional[tuple] = None
+    seasons: Optional[tuple] = None
+    severities: Optional[tuple] = None
+    positions: Optional[tuple] = None
+    age_groups: Optional[tuple] = None
+    ranges: tuple = ()
+
+    def categorical(self):
+        return (('Team Name', self.teams), ('Season', self.seasons), ('Injury_Severity', self.severities),
+                ('Position', self.positions), ('Age_Group', self.age_groups))
+
+
+def build_range_indexes(df, columns=RANGE_FILTER_COLUMNS):
+    """
+    Presort each range-filter column once.
+
+    Returns {column: (sorted_values, row_positions)}; rows with a missing value
+    are left out of the index, so they never satisfy a range filter.
+    """
+    indexes = {}
+    for col in columns:
+        values = df[col].to_numpy()
+        positions = np.flatnonzero(~pd.isna(values))
+        order = np.argsort(values[positions], kind='stable')
+        indexes[col] = (values[positions][order], positions[order])
+    return indexes
+
+
+def _as_index_key(sorted_values, bound):
+    if np.issubdtype(sorted_values.dtype, np.datetime64):
+        return np.datetime64(pd.Timestamp(bound), 'ns')
+    return bound
+
+
+def range_positions(index, low=None, high=None):
+    """
+    Row positions whose value lies in [low, high], found by binary search.
+    """
+    sorted_values, positions = index
+    start = 0 if low is None else np.searchsorted(sorted_values, _as_index_key(sorted_values, low), side='left')
+    stop = len(sorted_values) if high is None else np.searchsorted(sorted_values, _as_index_key(sorted_values, high), side='right')
+    return positions[start:stop]
+
+
+def select_range_rows(indexes, ranges):
+    """
+    Intersect the index hits of several {column: (low, high)} ranges.
+
+    Returns sorted row positions, or None when no range is given.
+    """
+    hits = [range_positions(indexes[col], low, high) for col, (low, high) in ranges.items()]
+    if not hits:
+        return None
+    hits.sort(key=len)
+    rows = np.sort(hits[0])
+    for other in hits[1:]:
+        rows = np.intersect1d(rows, other, assume_unique=True)
+    return rows
+
+
+def matching_rows(df, teams=None, seasons=None, severities=None, positions=None, age_groups=None,
+                  row_positions=None):
+    """
+    Positions of the rows passing the sidebar's categorical filters. A filter
+    left as None is not applied.
+
+    row_positions (from select_range_rows) restricts the scan to rows that
+    already satisfy the range filters, so the categorical masks only touch
+    those rows.
+    """
+    rows = np.arange(len(df)) if row_positions is None else np.asarray(row_positions)
+    mask = np.ones(len(rows), dtype=bool)
+    for col, selected in (('Team Name', teams), ('Season', seasons), ('Injury_Severity', severities),
+                          ('Position', positions), ('Age_Group', age_groups)):
+        if selected is not None:
+            values = df[col] if row_positions is None else df[col].take(rows)
+            mask &= values.isin(selected).to_numpy()
+    return rows[mask]
+
+
+def filter_injuries(df, teams=None, seasons=None, severities=None, positions=None, age_groups=None,
+                    row_positions=None):
+    """
+    Apply the sidebar's categorical filters (see matching_rows).
+    """
+    return df.iloc[matching_rows(df, teams, seasons, severities, positions, age_groups, row_positions)]
+
+
+def filter_state_rows(df, range_indexes, state):
+    """
+    Positions of the rows matching a FilterState, answering its ranges from range_indexes.
+    """
+    ranges = {col: (low, high) for col, low, high in state.ranges}
+    return matching_rows(
+        df,
+        teams=state.teams,
+        seasons=state.seasons,
+        severities=state.severities,
+        positions=state.positions,
+        age_groups=state.age_groups,
+        row_positions=select_range_rows(range_indexes, ranges)
+    )
+
+
+# ============================================================================
+# EXPORT
+# ============================================================================
+def stable_order(values, ascending):
+    """
+    Index of values sorted with missing values last and ties in index order,
+    for either direction (matches ORDER BY col [DESC] NULLS LAST, row id).
+    """
+    present = values.dropna()
+    if not ascending:
+        # Reverse, stable-sort ascending, reverse back: descending, ties still in index order
+        present = present.iloc[::-1]
+    ordered = present.sort_values(kind='mergesort').index
+    if not ascending:
+        ordered = ordered[::-1]
+    return ordered.append(values.index[values.isna()])
+
+
+def project_for_export(df, columns, sort_by='Performance_Drop_Index'):
+    """
+    Select the export columns and order rows by the sort column when it is
+    selected, in the dashboard's order (stable_order: ties by row position).
+    """
+    export_df = df[columns]
+    if sort_by in columns:
+        export_df = export_df.loc[stable_order(export_df[sort_by], ascending=False)]
+    return export_df
+
+
+def _to_arrow_table(df, columns=None):
+    import pyarrow as pa
+
+    # Convert only the projected columns straight from the frame, keeping
+    # datetimes, categoricals and floats as typed Arrow columns.
+    return pa.Table.from_pandas(df, columns=columns, preserve_index=False)
+
+
+def export_bytes(df, fmt, columns=None, compression=None):
+    """
+    Serialise a frame (optionally projected to columns) in one of EXPORT_FORMATS.
+
+    Parquet and Arrow IPC are written from the in-memory frame via pyarrow and
+    keep column dtypes; compression must be one of the format's listed codecs.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}'. Choose from: {', '.join(EXPORT_FORMATS)}")
+    if compression not in EXPORT_FORMATS[fmt][2]:
+        raise ValueError(f"Compression '{compression}' is not supported for {fmt}")
+
+    if fmt in ('csv', 'excel', 'json'):
+        frame = df if columns is None else df[columns]
+        if fmt == 'csv':
+            return frame.to_csv(index=False).encode('utf-8')
+        if fmt == 'json':
+            return frame.to_json(orient='records', indent=2).encode('utf-8')
+        excel_buffer = BytesIO()
+        with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
+            frame.to_excel(writer, sheet_name='Injuries', index=False)
+        return excel_buffer.getvalue()
+
+    import pyarrow as pa
+
+    table = _to_arrow_table(df, columns)
+    sink = pa.BufferOutputStream()
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        pq.write_table(table, sink, compression=compression or 'none')
+    else:
+        options = pa.ipc.IpcWriteOptions(compression=compression)
+        with pa.ipc.new_file(sink, table.schema, options=options) as writer:
+            writer.write_table(table)
+    return sink.getvalue().to_pybytes()
@@ -0,0 +1,365 @@
+"""
+Multi-session load-testing harness for the Football Injury Impact Dashboard.
+
+Starts one dashboard server (serve.py, as deployed) and drives it over the
+same websocket protocol the browser uses. Each simulated analyst is a thread
+with a session of its own, so N analysts compete for that one server's GIL,
+caches and script threads, as N browser tabs would. One session loads the
+dataset before the levels start, so every level begins from the warm state a
+running server has. A rerun only counts once it has rendered through to the
+end of the script; a truncated rerun is reported as an error, not as a
+latency.
+
+Each session replays an analyst workflow: initial load, sidebar filter
+changes, picking players in the deep dive, and changing the export column
+selection. Tab switches are client-side in Streamlit and do not trigger a
+rerun, so they are not timed. Memory is the server process's peak RSS during
+a level; MB/sess is its growth over the level's starting RSS per session.
+
+Usage:
+    python load_test.py
+    python load_test.py --rows 0 50000 --sessions 1 4 16 --iterations 3 --json results.json
+"""
+
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.runtime.state.common import user_key_from_element_id
+from websockets.sync.client import connect
+
+SERVE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'serve.py')
+SOURCE_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'player_injuries_impact.csv')
+
+
+# ============================================================================
+# SYNTHETIC DATA
+# ============================================================================
+def make_synthetic_dataset(n_rows, path, seed=42):
+    """
+    Write a synthetic injury file of n_rows rows with the source schema.
+
+    Rows are resampled from the real dataset; each copy gets a distinct player
+    name and a random date shift, so unique-player counts and temporal
+    groupings grow with the row count instead of collapsing onto the originals.
+    """
+    rng = np.random.default_rng(seed)
+    source = pd.read_csv(SOURCE_DATA, dtype=str)
+
+    picks = rng.integers(0, len(source), size=n_rows)
+    synthetic = source.iloc[picks].reset_index(drop=True)
+
+    copy_number = pd.Series(picks).groupby(picks).cumcount()
+    synthetic['Name'] = np.where(
+        copy_number == 0,
+        synthetic['Name'],
+        synthetic['Name'] + ' #' + copy_number.astype(str)
+    )
+
+    shift = pd.to_timedelta(rng.integers(-180, 180, size=n_rows), unit='D')
+    for col in ['Date of Injury', 'Date of return']:
+        dates = pd.to_datetime(synthetic[col], errors='coerce') + shift
+        synthetic[col] = dates.dt.strftime('%b %d, %Y').fillna(synthetic[col])
+
+    synthetic.to_csv(path, index=False)
+    return path
+
+
+# ============================================================================
+# DASHBOARD SERVER
+# ============================================================================
+class DashboardServer:
+    """
+    One dashboard server (serve.py) on a free local port, serving data_path.
+    Synthetic sessions must not teach the warmer (warmup.py) their random
+    filter states, so the usage log is disabled.
+    """
+
+    def __init__(self, data_path, timeout):
+        with socket.socket() as probe:
+            probe.bind(('localhost', 0))
+            self.port = probe.getsockname()[1]
+        self.url = f'ws://localhost:{self.port}/_stcore/stream'
+        env = dict(os.environ, INJURY_DASHBOARD_DATA=data_path, INJURY_DASHBOARD_USAGE_LOG='')
+        self.process = subprocess.Popen(
+            [sys.executable, SERVE_FILE, '--server.headless', 'true', '--server.port', str(self.port),
+             '--browser.gatherUsageStats', 'false'],
+            cwd=os.path.dirname(SERVE_FILE), env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        self._wait_until_healthy(timeout)
+
+    def _wait_until_healthy(self, timeout):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Dashboard server exited with code {self.process.returncode}")
+            try:
+                with urllib.request.urlopen(f'http://localhost:{self.port}/_stcore/health', timeout=1) as health:
+                    if health.status == 200:
+                        return
+            except OSError:
+                time.sleep(0.2)
+        self.stop()
+        raise RuntimeError(f"Dashboard server did not come up within {timeout}s")
+
+    def rss_mb(self):
+        """
+        Resident set size of the server process in MB (Linux /proc).
+        """
+        try:
+            with open(f'/proc/{self.process.pid}/status') as status:
+                for line in status:
+                    if line.startswith('VmRSS:'):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            pass
+        return float('nan')
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class RssSampler:
+    """
+    Background thread recording the server's peak RSS while a level runs.
+    """
+
+    def __init__(self, server, interval=0.1):
+        self.server = server
+        self.interval = interval
+        self.peak_mb = server.rss_mb()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak_mb = max(self.peak_mb, self.server.rss_mb())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, self.server.rss_mb())
+
+
+# ============================================================================
+# SESSION SIMULATION
+# ============================================================================
+class BrowserSession:
+    """
+    One analyst's browser tab: a websocket session against the server that
+    sends widget values and reads back the rendered elements, as the
+    Streamlit frontend does.
+    """
+
+    def __init__(self, url, timeout):
+        self.timeout = timeout
+        self.connection = connect(url, subprotocols=['streamlit'], max_size=None, open_timeout=timeout)
+        self.widgets = {}
+        self._values = {}
+
+    def options(self, key):
+        return list(self.widgets[key].options)
+
+    def run(self, **values):
+        """
+        Rerun the script with the given widget values (by widget key) on top
+        of the ones set before, and wait for the rerun to finish. A rerun only
+        counts once it has rendered through to the end of the script: the
+        sidebar's last panel and the page footer are both present.
+        """
+        self._values.update(values)
+        rerun = BackMsg()
+        rerun.rerun_script.SetInParent()
+        for key, value in self._values.items():
+            state = rerun.rerun_script.widget_states.widgets.add()
+            state.id = self.widgets[key].id
+            if isinstance(value, str):
+                state.string_value = value
+            else:
+                state.string_array_value.data[:] = value
+        self.connection.send(rerun.SerializeToString())
+
+        widgets, expanders, footer = {}, set(), False
+        while True:
+            msg = ForwardMsg()
+            msg.ParseFromString(self.connection.recv(timeout=self.timeout))
+            kind = msg.WhichOneof('type')
+            if kind == 'script_finished':
+                if msg.script_finished != ForwardMsg.FINISHED_SUCCESSFULLY:
+                    raise RuntimeError(f"Rerun finished with status {msg.script_finished}")
+                break
+            if kind != 'delta':
+                continue
+            if msg.delta.WhichOneof('type') == 'add_block' and msg.delta.add_block.HasField('expandable'):
+                expanders.add(msg.delta.add_block.expandable.label)
+            if msg.delta.WhichOneof('type') != 'new_element':
+                continue
+            element = msg.delta.new_element
+            element_type = element.WhichOneof('type')
+            if element_type == 'exception':
+                raise RuntimeError(f"App raised during rerun: {element.exception.message}")
+            if element_type == 'markdown' and 'class="footer"' in element.markdown.body:
+                footer = True
+            widget_id = getattr(getattr(element, element_type), 'id', '')
+            if widget_id.startswith('$$ID'):
+                widgets[user_key_from_element_id(widget_id)] = getattr(element, element_type)
+
+        if "🧠 Cache Memory" not in expanders or not footer:
+            raise RuntimeError("Rerun ended before the end of the script")
+        self.widgets = widgets
+        return self
+
+    def close(self):
+        self.connection.close()
+
+
+def timed_run(session, latencies, **values):
+    start = time.perf_counter()
+    session.run(**values)
+    latencies.append(time.perf_counter() - start)
+
+
+def simulate_session(url, session_id, iterations, timeout):
+    """
+    Replay an analyst workflow in one browser session. Returns the rerun
+    latencies and errors.
+    """
+    latencies, errors = [], []
+    rng = random.Random(session_id)
+    session = None
+    try:
+        session = BrowserSession(url, timeout)
+        timed_run(session, latencies)
+
+        teams = session.options('teams_filter')
+        seasons = session.options('seasons_filter')
+        export_columns = session.options('export_columns')
+
+        for _ in range(iterations):
+            team_pick = rng.sample(teams, k=max(1, len(teams) // 2))
+            timed_run(session, latencies, teams_filter=team_pick)
+
+            season_pick = rng.sample(seasons, k=max(1, len(seasons) // 2))
+            timed_run(session, latencies, seasons_filter=season_pick)
+
+            players = session.options('player_selector')
+            if players:
+                timed_run(session, latencies, player_selector=rng.choice(players))
+
+            column_pick = ['Performance_Drop_Index'] + rng.sample(export_columns, k=min(8, len(export_columns)))
+            column_pick = list(dict.fromkeys(column_pick))
+            timed_run(session, latencies, export_columns=column_pick)
+
+            timed_run(session, latencies, teams_filter=teams)
+            timed_run(session, latencies, seasons_filter=seasons)
+    except Exception as e:
+        errors.append(f"session {session_id}: {e}")
+    finally:
+        if session is not None:
+            session.close()
+    return latencies, errors
+
+
+def run_level(server, n_sessions, iterations, timeout):
+    """
+    Run n_sessions concurrent sessions against one server and summarise
+    latency, throughput and the server's memory.
+    """
+    baseline_mb = server.rss_mb()
+    start = time.perf_counter()
+    with RssSampler(server) as rss, ThreadPoolExecutor(n_sessions) as pool:
+        sessions = list(pool.map(lambda i: simulate_session(server.url, i, iterations, timeout),
+                                 range(n_sessions)))
+    wall = time.perf_counter() - start
+
+    latencies = [latency for session_latencies, _ in sessions for latency in session_latencies]
+    errors = [error for _, session_errors in sessions for error in session_errors]
+    latencies_ms = np.array(latencies) * 1000
+
+    return {
+        'sessions': n_sessions,
+        'reruns': len(latencies),
+        'errors': errors,
+        'p50_ms': float(np.percentile(latencies_ms, 50)) if len(latencies_ms) else float('nan'),
+        'p95_ms': float(np.percentile(latencies_ms, 95)) if len(latencies_ms) else float('nan'),
+        'p99_ms': float(np.percentile(latencies_ms, 99)) if len(latencies_ms) else float('nan'),
+        'throughput_rps': len(latencies) / wall if wall > 0 else float('nan'),
+        'rss_mb': rss.peak_mb,
+        'rss_per_session_mb': (rss.peak_mb - baseline_mb) / n_sessions,
+    }
+
+
+# ============================================================================
+# ENTRY POINT
+# ============================================================================
+def main():
+    parser = argparse.ArgumentParser(description="Headless multi-session load test for app.py.")
+    parser.add_argument('--rows', type=int, nargs='+', default=[0, 10000],
+                        help="Synthetic dataset sizes to test (0 uses the shipped dataset)")
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 2, 4, 8],
+                        help="Concurrent session counts to test")
+    parser.add_argument('--iterations', type=int, default=2, help="Workflow repetitions per session")
+    parser.add_argument('--timeout', type=float, default=120, help="Per-rerun timeout in seconds")
+    parser.add_argument('--json', default=None, help="Optional path to write the results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for n_rows in args.rows:
+            data_path = SOURCE_DATA
+            if n_rows > 0:
+                data_path = make_synthetic_dataset(n_rows, os.path.join(tmp_dir, f'injuries_{n_rows}.csv'))
+            with DashboardServer(data_path, args.timeout) as server:
+                # One session builds the dataset, as a running server has before analysts arrive
+                _, errors = simulate_session(server.url, -1, 0, args.timeout)
+                if errors:
+                    sys.exit(f"Initial load failed: {errors[0]}")
+
+                print(f"\n=== Dataset: {n_rows or 'shipped'} rows ===")
+                print(f"{'Sessions':>8}{'Reruns':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+                      f"{'Reruns/s':>10}{'RSS MB':>10}{'MB/sess':>10}")
+                for n_sessions in args.sessions:
+                    level = run_level(server, n_sessions, args.iterations, args.timeout)
+                    level['rows'] = n_rows
+                    results.append(level)
+                    print(f"{level['sessions']:>8}{level['reruns']:>8}{level['p50_ms']:>10.0f}"
+                          f"{level['p95_ms']:>10.0f}{level['p99_ms']:>10.0f}{level['throughput_rps']:>10.2f}"
+                          f"{level['rss_mb']:>10.0f}{level['rss_per_session_mb']:>10.1f}")
+                    for error in level['errors']:
+                        print(f"  ! {error}")
+
+    if args.json:
+        with open(args.json, 'w') as out:
+            json.dump(results, out, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Opponent-strength ratings for the Football Injury Impact Dashboard.
+
+Every before/missed/after match in the dataset is a (team, opposition, GD)
+observation. Team ratings are fitted by least squares to GD = r_team - r_opp
+over all of them at once, and each match GD is then adjusted for its
+opponent (GD + r_opp: the margin expected against an average side), so a
+run of games against Man City no longer reads as a collapse.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Match phases in the source columns, in the order before / during / after
+MATCH_PHASES = {'before': 'before_injury', 'during': 'missed_match', 'after': 'after_injury'}
+MATCH_SLOTS = (1, 2, 3)
+
+ADJUSTED_GD_COLUMNS = {'before': 'Adj_GD_Before', 'during': 'Adj_GD_During', 'after': 'Adj_GD_After'}
+
+# Small ridge so clubs only linked through a few matches still get a rating
+RIDGE = 1e-3
+
+
+def _match_columns(suffix):
+    return [f'Match{slot}_{phase}_{suffix}' for phase in MATCH_PHASES.values() for slot in MATCH_SLOTS]
+
+
+# Every column fit_ratings and opponent_adjusted_gd read
+RATING_INPUT_COLUMNS = ['Team Name'] + _match_columns('GD') + _match_columns('Opposition')
+
+
+def match_matrices(df):
+    """
+    (GD, opposition) as two n x 9 arrays, one column per match slot, with the
+    phases in MATCH_PHASES order. Missing opponents are None.
+    """
+    gd = df[_match_columns('GD')].to_numpy(dtype='float64', na_value=np.nan)
+    opposition = df[_match_columns('Opposition')].replace('N.A.', None).to_numpy(dtype=object)
+    return gd, opposition
+
+
+def rating_observations(df):
+    """
+    What fit_ratings needs from a set of rows: the number of matches and the
+    GD total of every (team, opposition) pair. Observations of several
+    partitions of a dataset add up (merge_observations).
+    """
+    gd, opposition = match_matrices(df)
+    teams = np.repeat(df['Team Name'].to_numpy(dtype=object), gd.shape[1])
+    opposition = opposition.ravel()
+    gd = gd.ravel()
+    valid = ~np.isnan(gd) & pd.notna(opposition) & pd.notna(teams)
+
+    clubs = pd.Index(pd.unique(np.concatenate([teams[valid], opposition[valid]])))
+    pairs = clubs.get_indexer(teams[valid]) * len(clubs) + clubs.get_indexer(opposition[valid])
+    matches = np.bincount(pairs, minlength=len(clubs) ** 2)
+    gd_total = np.bincount(pairs, weights=gd[valid], minlength=len(clubs) ** 2)
+
+    observed = np.flatnonzero(matches)
+    index = pd.MultiIndex.from_arrays([clubs[observed // len(clubs)], clubs[observed % len(clubs)]],
+                                      names=['team', 'opposition'])
+    return pd.DataFrame({'matches': matches[observed], 'gd': gd_total[observed]}, index=index)
+
+
+def merge_observations(observations):
+    return pd.concat(observations).groupby(level=['team', 'opposition']).sum()
+
+
+def solve_ratings(observations, ridge=RIDGE):
+    """
+    Least-squares club ratings (mean zero) from rating observations, solved
+    through the normal equations.
+    """
+    if observations.empty:
+        return pd.Series(dtype='float64', name='Rating')
+    clubs = observations.index.get_level_values('team').append(
+        observations.index.get_level_values('opposition')).unique().sort_values()
+    home = clubs.get_indexer(observations.index.get_level_values('team'))
+    away = clubs.get_indexer(observations.index.get_level_values('opposition'))
+    matches = observations['matches'].to_numpy(dtype='float64')
+    gd = observations['gd'].to_numpy()
+
+    # Each match is a design row with +1 at the team and -1 at the opponent;
+    # accumulate A'A and A'y per pair instead of building A
+    normal = np.zeros((len(clubs), len(clubs)))
+    np.add.at(normal, (home, home), matches)
+    np.add.at(normal, (away, away), matches)
+    np.add.at(normal, (home, away), -matches)
+    np.add.at(normal, (away, home), -matches)
+    target = np.zeros(len(clubs))
+    np.add.at(target, home, gd)
+    np.add.at(target, away, -gd)
+
+    # Ratings are only defined up to a constant: pin their sum to zero
+    normal += 1.0 + ridge * np.eye(len(clubs))
+    ratings = np.linalg.solve(normal, target)
+    return pd.Series(ratings - ratings.mean(), index=clubs, name='Rating')
+
+
+def fit_ratings(df, ridge=RIDGE):
+    """
+    Least-squares club ratings (mean zero) from every team/opposition/GD
+    observation.
+    """
+    return solve_ratings(rating_observations(df), ridge)
+
+
+def opponent_adjusted_gd(df, ratings):
+    """
+    Opponent-adjusted average GD before, during and after every injury, and
+    the adjusted Team_Performance_Drop, in one batched pass over all 9 slots.
+    Returns a new frame of those columns on df's index; df is not modified.
+    """
+    gd = df[_match_columns('GD')].to_numpy(dtype='float64', na_value=np.nan)
+    # Placeholders and unrated clubs find no rating and leave the slot empty
+    rating_by_club = np.append(ratings.to_numpy(), np.nan)
+    opponent_rating = np.column_stack([
+        rating_by_club[ratings.index.get_indexer(df[col])] for col in _match_columns('Opposition')
+    ])
+    adjusted = (gd + opponent_rating).reshape(len(df), len(MATCH_PHASES), len(MATCH_SLOTS))
+
+    counts = np.sum(~np.isnan(adjusted), axis=2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = np.nansum(adjusted, axis=2) / counts
+
+    result = pd.DataFrame(means, index=df.index, columns=list(ADJUSTED_GD_COLUMNS.values()))
+    result['Adj_Team_Performance_Drop'] = result['Adj_GD_Before'] - result['Adj_GD_During']
+    return result
@@ -0,0 +1,236 @@
+"""
+Partitioned multi-core preprocessing for large historical loads.
+
+The input (one or many CSV files) is cut into partitions: every file, and
+large files further into line-aligned byte ranges. A process pool reads,
+validates and engineers the partitions in parallel with the row-local part of
+the pipeline (injury_data.preprocess_rows). The parent then merges them in
+source order, unifies categorical columns (including the text columns, which
+travel back as categoricals), merges the quality reports and
+applies their thresholds, and runs the global steps once over all rows
+(injury_data.finalize_features: median imputation, the duration-based
+Recovery_Index, opponent-adjusted GD). The opponent ratings are solved from
+match statistics the workers collect per partition, so the parent never
+rescans the matches. The result equals a serial load of the concatenated
+files.
+
+With a feature cache, row-stage features are cached per partition: workers
+key each feature on the content of their rows, skip the ones the parent's
+cache already holds (unless another feature needs them), and the parent
+fills those in. Changing one feature parameter then only recomputes the
+features downstream of it, in every partition.
+
+Byte-range partitions assume no quoted field spans a line break; a partition
+whose row count does not match its line count raises ValueError.
+
+Worker processes are forked, which is only safe while the forking process
+runs no other threads. A server starts one pool at boot (start_worker_pool,
+called by serve.py) and every load reuses it; a single-threaded caller such
+as the CLI gets a pool per load; anywhere else the partitions are processed
+in-process.
+"""
+
+import logging
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import NamedTuple
+
+import pandas as pd
+
+from data_quality import DATE_COLUMNS, KNOWN_CLUBS, QualityReport, infer_date_formats
+from injury_data import FEATURES, finalize_features, parse_rows
+from opponent_strength import merge_observations, rating_observations
+
+# Largest byte range one task reads from a file
+PARTITION_BYTES = 64 * 2 ** 20
+
+# Rows of the first file read to fix the date formats for every partition
+DATE_FORMAT_SAMPLE_ROWS = 10000
+
+logger = logging.getLogger(__name__)
+
+# Process-wide pool from start_worker_pool, and its size
+_worker_pool = None
+_worker_pool_size = None
+
+
+class Partition(NamedTuple):
+    path: str
+    start: int
+    stop: int
+    header: bytes
+
+
+def _pool_context():
+    # Forked workers start without re-importing the main module, which under
+    # Streamlit is the dashboard script itself; where fork is unavailable,
+    # spawned workers do re-import it
+    return multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn')
+
+
+def start_worker_pool(workers=None):
+    """
+    Start the process-wide pool of preprocessing workers (os.cpu_count() by
+    default), kept for the life of the process. Must be called before any
+    other thread starts: a child forked while another thread holds a lock
+    (an import or logging lock) can deadlock. Later calls return the same pool.
+    """
+    global _worker_pool, _worker_pool_size
+    if _worker_pool is None:
+        if threading.active_count() > 1:
+            raise RuntimeError("start_worker_pool must be called before any other thread starts")
+        _worker_pool_size = workers or os.cpu_count() or 1
+        _worker_pool = _pool_context().Pool(_worker_pool_size)
+    return _worker_pool
+
+
+def plan_partitions(data_paths, workers, partition_bytes=PARTITION_BYTES):
+    """
+    Line-aligned byte ranges covering every file in order: at most
+    partition_bytes each, and small enough that there are at least as many
+    partitions as workers.
+    """
+    sizes = [os.path.getsize(path) for path in data_paths]
+    target = max(1, min(partition_bytes, math.ceil(sum(sizes) / max(workers, 1))))
+
+    partitions = []
+    for path, size in zip(data_paths, sizes):
+        with open(path, 'rb') as source:
+            header = source.readline()
+            start = source.tell()
+            while start < size:
+                source.seek(min(start + target, size))
+                if source.tell() < size:
+                    source.readline()
+                stop = source.tell()
+                partitions.append(Partition(path, start, stop, header))
+                start = stop
+    return partitions
+
+
+def _preprocess_partition(partition, known_teams, date_formats, feature_params, cached_keys=None):
+    """
+    Read and engineer one partition in a worker process: (frame, quality
+    report, opponent rating observations, text columns, feature keys, features
+    computed). Given the (feature, key) pairs the parent's cache holds, the
+    features it can fill in are skipped and left out of the frame.
+    """
+    with open(partition.path, 'rb') as source:
+        source.seek(partition.start)
+        data = source.read(partition.stop - partition.start)
+    df = pd.read_csv(BytesIO(partition.header + data))
+
+    lines = data.count(b'\n') + (not data.endswith(b'\n'))
+    if len(df) != lines - data.count(b'\n\n'):
+        raise ValueError(f"{partition.path}: records span line breaks; load this file with workers=1")
+    df, quality_report = parse_rows(df, known_teams, quality_thresholds={}, date_formats=date_formats)
+    keys, skip = None, set()
+    if cached_keys is not None:
+        keys = FEATURES.keys(df, 'row', feature_params)
+        skip = FEATURES.skip(keys, cached_keys)
+    df = FEATURES.compute(df, stage='row', params=feature_params, keys=keys, skip=skip)
+    computed = [name for name in FEATURES.order if FEATURES.features[name].stage == 'row' and name not in skip]
+    observations = rating_observations(df)
+
+    # Text columns travel back to the parent as categoricals: pickling their
+    # codes is far cheaper than pickling millions of repeated strings
+    text_columns = df.columns[df.dtypes == object].tolist()
+    df[text_columns] = df[text_columns].astype('category')
+    return df, quality_report, observations, text_columns, keys, computed
+
+
+def _fill_cached_features(frame, text_columns, keys, computed, feature_params, feature_cache):
+    """
+    Cache the row-stage features a worker computed (as a serial load holds
+    them: text as object) and fill in the ones it skipped, in serial column order.
+    """
+    for name in computed:
+        for col in FEATURES.features[name].columns:
+            if col in text_columns:
+                frame[col] = frame[col].astype(object)
+    FEATURES.compute(frame, stage='row', params=feature_params, cache=feature_cache, keys=keys, present=computed)
+
+    feature_columns = [col for name in FEATURES.order if FEATURES.features[name].stage == 'row'
+                       for col in FEATURES.features[name].columns]
+    return frame[[col for col in frame.columns if col not in feature_columns] + feature_columns]
+
+
+def unify_categories(frames):
+    """
+    Give each categorical column the union of its categories across all
+    partitions, so that concatenation keeps it categorical.
+    """
+    for col in frames[0].columns:
+        dtypes = [frame[col].dtype for frame in frames]
+        if not all(isinstance(dtype, pd.CategoricalDtype) for dtype in dtypes):
+            continue
+        categories = pd.Index(dtypes[0].categories)
+        for dtype in dtypes[1:]:
+            categories = categories.append(pd.Index(dtype.categories).difference(categories))
+        unified = pd.CategoricalDtype(categories, ordered=dtypes[0].ordered)
+        for frame in frames:
+            frame[col] = frame[col].astype(unified)
+    return frames
+
+
+def load_and_preprocess_parallel(data_paths, workers=None, known_teams=KNOWN_CLUBS, quality_thresholds=None,
+                                 with_report=False, partition_bytes=PARTITION_BYTES, feature_params=None,
+                                 feature_cache=None):
+    """
+    load_and_preprocess over one or many CSV files, with the row-local work
+    spread over a pool of worker processes (os.cpu_count() by default).
+    feature_cache (which must also provide keys(namespace, kind), like
+    MemoryBudgetCache) holds row-stage features per partition and the
+    global-stage features, which run here.
+
+    The files are treated as one dataset in the given order. Quality
+    thresholds apply to the merged report; a failure raises DataQualityError
+    before the global steps run.
+    """
+    if isinstance(data_paths, (str, os.PathLike)):
+        data_paths = [data_paths]
+    workers = workers or _worker_pool_size or os.cpu_count() or 1
+    partitions = plan_partitions(data_paths, workers, partition_bytes)
+    if not partitions:
+        raise ValueError("No rows to preprocess")
+
+    # pd.to_datetime guesses a format from the first value it sees; fix one
+    # for the whole load so that every partition parses dates the same way
+    date_formats = infer_date_formats(pd.read_csv(data_paths[0], usecols=DATE_COLUMNS,
+                                                  nrows=DATE_FORMAT_SAMPLE_ROWS))
+    cached_keys = FEATURES.cached_keys(feature_cache) if feature_cache is not None else None
+    tasks = (partitions, [known_teams] * len(partitions), [date_formats] * len(partitions),
+             [feature_params] * len(partitions), [cached_keys] * len(partitions))
+
+    if workers == 1:
+        results = list(map(_preprocess_partition, *tasks))
+    elif _worker_pool is not None:
+        results = _worker_pool.starmap(_preprocess_partition, zip(*tasks), chunksize=1)
+    elif threading.active_count() == 1:
+        with ProcessPoolExecutor(min(workers, len(partitions)), mp_context=_pool_context()) as pool:
+            results = list(pool.map(_preprocess_partition, *tasks))
+    else:
+        logger.warning("No preprocessing pool was started before this process's threads (see "
+                       "start_worker_pool); preprocessing %d partitions in-process", len(partitions))
+        results = list(map(_preprocess_partition, *tasks))
+
+    frames, reports, observations, text_columns, keys, computed = zip(*results)
+    quality_report = QualityReport.merged(reports, sources=[partition.path for partition in partitions])
+    quality_report.check(quality_thresholds)
+
+    if feature_cache is not None:
+        frames = [_fill_cached_features(frame, frame_text_columns, frame_keys, frame_computed, feature_params,
+                                        feature_cache)
+                  for frame, frame_text_columns, frame_keys, frame_computed in zip(frames, text_columns, keys, computed)]
+
+    df = pd.concat(unify_categories(list(frames)), ignore_index=True)
+    text_columns = list(dict.fromkeys(col for columns in text_columns for col in columns))
+    df[text_columns] = df[text_columns].astype(object)
+    df = finalize_features(df, merge_observations(observations), feature_params, feature_cache)
+    if with_report:
+        return df, quality_report
+    return df
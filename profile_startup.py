@@ -0,0 +1,125 @@
+"""
+Startup import profiler for the Football Injury Impact Dashboard.
+
+Measures the cold import cost of every module app.py loads in a fresh
+interpreter via ``python -X importtime``, so cold-start regressions show up
+as numbers rather than as a slower first paint. The module lists are read
+from app.py itself: its top-level imports (eager) and its lazy_import() calls.
+Eager modules are imported together in app.py's order, each charged only for
+what it adds; a lazy module is charged for what it adds on top of them.
+
+Usage:
+    python profile_startup.py
+    python profile_startup.py --repeat 5 --budget-ms 1500
+"""
+
+import argparse
+import ast
+import os
+import statistics
+import subprocess
+import sys
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(APP_DIR, 'app.py')
+
+MARKER = '--profile-startup-imported '
+
+
+def app_modules(app_path=APP_PATH):
+    """
+    (eager, lazy) module names of app.py: its top-level non-stdlib imports,
+    and the string arguments of its lazy_import() calls, in source order.
+    """
+    with open(app_path) as app_file:
+        tree = ast.parse(app_file.read())
+
+    eager = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            eager += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            eager.append(node.module)
+    eager = [name for name in eager if name.split('.')[0] not in sys.stdlib_module_names]
+
+    calls = sorted((node for node in ast.walk(tree)
+                    if isinstance(node, ast.Call) and getattr(node.func, 'id', None) == 'lazy_import'
+                    and node.args and isinstance(node.args[0], ast.Constant)),
+                   key=lambda node: node.lineno)
+    lazy = [node.args[0].value for node in calls]
+    return list(dict.fromkeys(eager)), list(dict.fromkeys(lazy))
+
+
+def measure_imports(module_names, preload=()):
+    """
+    Import preload, then module_names, in order in a fresh interpreter (run
+    from the app directory, so local modules resolve). Return {module: ms of
+    imports it added}, or None if any of them fails to import.
+    """
+    # A marker line on stderr after each import statement delimits the
+    # importtime lines it produced
+    statements = ['import sys']
+    for name in [*preload, *module_names]:
+        statements += [f'import {name}', f'sys.stderr.write("{MARKER}{name}\\n")']
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', '; '.join(statements)],
+        capture_output=True,
+        text=True,
+        cwd=APP_DIR
+    )
+    if result.returncode != 0:
+        return None
+
+    # Lines look like: "import time:   self [us] | cumulative | imported package".
+    # Unindented lines are imported directly by the statement; their
+    # cumulative times add up to everything it loaded.
+    timings, segment_us = {}, 0
+    for line in result.stderr.splitlines():
+        if line.startswith(MARKER):
+            timings[line[len(MARKER):]] = segment_us / 1000
+            segment_us = 0
+            continue
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) == 3 and not parts[2].startswith('  ') and parts[1].strip().isdigit():
+            segment_us += int(parts[1])
+    return {name: timings[name] for name in module_names}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report per-module cold import cost.")
+    parser.add_argument('--repeat', type=int, default=3, help="Fresh-interpreter runs per module (median reported)")
+    parser.add_argument('--budget-ms', type=float, default=None,
+                        help="Exit non-zero if the eager modules together exceed this budget")
+    args = parser.parse_args()
+
+    print(f"{'Module':<25}{'Mode':<8}{'Median (ms)':>12}")
+    print("-" * 45)
+
+    eager_modules, lazy_modules = app_modules()
+    runs = [('eager', eager_modules, ())] + [('lazy', [name], eager_modules) for name in lazy_modules]
+
+    eager_total = 0.0
+    for mode, modules, preload in runs:
+        samples = [measure_imports(modules, preload) for _ in range(args.repeat)]
+        samples = [sample for sample in samples if sample is not None]
+        for module_name in modules:
+            if not samples:
+                print(f"{module_name:<25}{mode:<8}{'missing':>12}")
+                continue
+            median_ms = statistics.median(sample[module_name] for sample in samples)
+            if mode == 'eager':
+                eager_total += median_ms
+            print(f"{module_name:<25}{mode:<8}{median_ms:>12.1f}")
+
+    print("-" * 45)
+    print(f"{'Eager total':<33}{eager_total:>12.1f}")
+
+    if args.budget_ms is not None and eager_total > args.budget_ms:
+        print(f"Eager import cost {eager_total:.1f} ms exceeds budget {args.budget_ms:.1f} ms")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,659 @@
+"""
+Query backends for the Football Injury Impact Dashboard.
+
+Every view in app.py asks a backend for a small result (a grouped aggregate,
+a pivot, the top-N rows, a projected slice) instead of working on a fully
+materialised filtered frame. Two interchangeable backends are provided:
+
+- PandasBackend (default): the engineered frame held in memory, filtered with
+  the presorted range indexes from injury_data.
+- DuckDBBackend (optional, ``pip install duckdb``): the engineered dataset as
+  a Parquet file queried in-process, so filters, groupbys, pivots and top-N
+  selections run as SQL and only their results reach pandas.
+
+Both backends apply the same ordering rules (measure, then group key, then
+original row order) so they return identical results for the same query.
+"""
+
+import itertools
+import json
+import logging
+import os
+import weakref
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from data_quality import KNOWN_CLUBS, QualityReport
+from injury_data import (
+    AGE_GROUP_LABELS, FEATURE_PARAMS, PERFORMANCE_LABELS, PIPELINE_VERSION, SEVERITY_LEVELS, FilterState,
+    build_range_indexes, filter_state_rows, load_and_preprocess, stable_order
+)
+from parallel_preprocess import load_and_preprocess_parallel
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ['pandas', 'duckdb']
+
+# Measure functions understood by View.aggregate: {output: (column, func)}
+PANDAS_FUNCS = {'mean': 'mean', 'sum': 'sum', 'count': 'count', 'std': 'std',
+                'min': 'min', 'max': 'max', 'nunique': 'nunique'}
+# Float measures are rounded to this many decimals in both backends, so that
+# summation-order noise cannot reorder groups whose values are really tied
+MEASURE_DECIMALS = 9
+
+SQL_FUNCS = {'mean': f'ROUND(AVG({{}}), {MEASURE_DECIMALS})',
+             'sum': f'ROUND(COALESCE(SUM({{}}), 0), {MEASURE_DECIMALS})',
+             'count': 'COUNT({})', 'std': f'ROUND(STDDEV_SAMP({{}}), {MEASURE_DECIMALS})',
+             'min': 'MIN({})', 'max': 'MAX({})', 'nunique': 'COUNT(DISTINCT {})'}
+
+# Categorical columns restored after a round trip through Parquet/SQL
+CATEGORICAL_COLUMNS = {'Age_Group': AGE_GROUP_LABELS, 'Performance_Category': PERFORMANCE_LABELS}
+
+ROW_ID = '_row_id'
+
+# DuckDB fetches of more row ids than this (e.g. a whole filtered set for an
+# export) join against the id list instead of spelling it out as IN (...)
+FETCH_IN_LIST_ROWS = 1000
+
+# Parquet schema metadata recording the pipeline that engineered the file
+PIPELINE_METADATA_KEY = b'injury_dashboard.pipeline_version'
+# ...the feature parameters it was engineered with...
+FEATURE_PARAMS_METADATA_KEY = b'injury_dashboard.feature_params'
+# ...and the data-quality report of the CSV it was engineered from
+QUALITY_METADATA_KEY = b'injury_dashboard.quality_report'
+
+
+def _finish_aggregate(result, measures, order_by, ascending, limit):
+    """
+    Shared post-processing so both backends return the same shape and dtypes.
+    """
+    for name, (_, func) in measures.items():
+        if func in ('count', 'nunique'):
+            result[name] = result[name].astype('int64')
+        elif func in ('mean', 'sum', 'std'):
+            result[name] = result[name].astype('float64').round(MEASURE_DECIMALS)
+        else:
+            result[name] = result[name].astype('float64')
+    if order_by is not None:
+        # Input is key-sorted, so a stable sort breaks ties by group key
+        result = result.sort_values(order_by, ascending=ascending, kind='mergesort')
+    if limit is not None:
+        result = result.head(limit)
+    return result
+
+
+def _pivot_long(long_counts, index, columns):
+    pivot = long_counts.pivot(index=index, columns=columns, values='n').fillna(0).astype('int64')
+    return pivot.sort_index().sort_index(axis=1)
+
+
+# ============================================================================
+# PANDAS BACKEND
+# ============================================================================
+def _take_rows(df, rows, columns):
+    """
+    The rows of df at positions rows, copying only the given columns.
+    """
+    return pd.DataFrame({col: df[col].array.take(rows) for col in dict.fromkeys(columns)},
+                        index=df.index[rows], copy=False)
+
+
+class PandasView:
+    """
+    Queries over the rows matching one FilterState, on the in-memory frame.
+    Row ids are positions in the backend's frame. The filter is evaluated on
+    first use and each query copies only the columns it reads, so a rerun
+    answered from cached results never touches the rows.
+    """
+
+    def __init__(self, backend, state):
+        self.backend = backend
+        self.state = state
+
+    @cached_property
+    def row_ids(self):
+        """
+        Positions of the matching rows, or None when nothing is filtered.
+        """
+        if self.state == FilterState():
+            return None
+        return filter_state_rows(self.backend.df, self.backend.range_indexes, self.state)
+
+    def _frame(self, columns):
+        # Views never modify their frame, so an unfiltered view shares the backend's
+        if self.row_ids is None:
+            return self.backend.df
+        return _take_rows(self.backend.df, self.row_ids, columns)
+
+    def _matching(self, columns, equals):
+        frame = self._frame(list(columns) + list(equals or {}))
+        for col, value in (equals or {}).items():
+            frame = frame[frame[col] == value]
+        return frame
+
+    def count(self):
+        return len(self.backend.df) if self.row_ids is None else len(self.row_ids)
+
+    def aggregate(self, by, measures, order_by=None, ascending=False, limit=None):
+        frame = self._frame(([by] if by is not None else []) + [col for col, _ in measures.values()])
+        if by is None:
+            return pd.Series({name: frame[col].agg(PANDAS_FUNCS[func])
+                              for name, (col, func) in measures.items()}, dtype='float64')
+        grouped = frame.groupby(by, observed=True)
+        result = pd.DataFrame({name: grouped[col].agg(PANDAS_FUNCS[func])
+                               for name, (col, func) in measures.items()})
+        return _finish_aggregate(result, measures, order_by, ascending, limit)
+
+    def pivot_count(self, index, columns, value, top_n):
+        top = self.aggregate(index, {'n': (value, 'count')}, order_by='n', limit=top_n).index
+        frame = self._frame([index, columns, value])
+        subset = frame[frame[index].isin(top)]
+        long_counts = subset.groupby([index, columns], observed=True)[value].count().rename('n').reset_index()
+        return _pivot_long(long_counts, index, columns)
+
+    def top_rows(self, order_col, n, columns):
+        frame = self._frame([order_col] + list(columns))
+        ranked = frame[frame[order_col].notna()].nlargest(n, order_col)
+        return ranked[columns].reset_index(drop=True)
+
+    def rows(self, columns=None, equals=None):
+        columns = columns or self.backend.columns
+        return self._matching(columns, equals)[columns].reset_index(drop=True)
+
+    def sort_order(self, order_by, ascending=False, equals=None, column_order=None):
+        """
+        Row ids of the matching rows ordered by order_by (missing values last,
+        ties in source order). column_order, the backend's whole-frame order
+        for the column (PandasBackend.sort_order), can be kept by the caller
+        and passed in: a filter state then only costs a linear membership pass.
+        """
+        order = self.backend.sort_order(order_by, ascending) if column_order is None else column_order
+        member = np.zeros(len(self.backend.df), dtype=bool)
+        if equals:
+            member[self._matching([], equals).index] = True
+        else:
+            member[slice(None) if self.row_ids is None else self.row_ids] = True
+        return order[member[order]]
+
+    def fetch(self, row_ids, columns):
+        """
+        The given rows, in the given order, projected to columns.
+        """
+        return _take_rows(self.backend.df, np.asarray(row_ids, dtype='int64'), columns).reset_index(drop=True)
+
+    def distinct(self, column):
+        return sorted(self._frame([column])[column].dropna().unique())
+
+
+class PandasBackend:
+    """
+    The default backend: the engineered frame and its range indexes in memory.
+    """
+    name = 'pandas'
+
+    def __init__(self, df, range_indexes=None, quality_report=None):
+        self.df = df
+        self.range_indexes = range_indexes if range_indexes is not None else build_range_indexes(df)
+        self.quality_report = quality_report
+        self.columns = df.columns.tolist()
+
+    def view(self, state):
+        return PandasView(self, state)
+
+    def sort_order(self, column, ascending=False):
+        """
+        Positions of every row ordered by column. Not kept here: callers that
+        reuse it hold it in their own cache (data_cache keeps it under the
+        memory budget) and pass it to PandasView.sort_order.
+        """
+        return stable_order(self.df[column].reset_index(drop=True), ascending).to_numpy()
+
+    def options(self, column):
+        return sorted(self.df[column].dropna().unique())
+
+    def extent(self, column):
+        sorted_values = self.range_indexes[column][0]
+        if len(sorted_values) == 0:
+            return None
+        return sorted_values[0], sorted_values[-1]
+
+
+# ============================================================================
+# DUCKDB BACKEND
+# ============================================================================
+def _quote(identifier):
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _feature_params_signature(feature_params):
+    return json.dumps({**FEATURE_PARAMS, **(feature_params or {})}, sort_keys=True).encode()
+
+
+def write_engineered_parquet(df, parquet_path, quality_report=None, feature_params=None):
+    """
+    Write the engineered frame, plus a row id that preserves source order, as Parquet.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_pandas(df.assign(**{ROW_ID: np.arange(len(df))}), preserve_index=False)
+    metadata = {**(table.schema.metadata or {}), PIPELINE_METADATA_KEY: str(PIPELINE_VERSION).encode(),
+                FEATURE_PARAMS_METADATA_KEY: _feature_params_signature(feature_params)}
+    if quality_report is not None:
+        metadata[QUALITY_METADATA_KEY] = quality_report.to_json().encode()
+    # Write then rename, so a DuckDB backend reading the old file never sees a partial one
+    pq.write_table(table.replace_schema_metadata(metadata), parquet_path + '.tmp', compression='zstd')
+    os.replace(parquet_path + '.tmp', parquet_path)
+    return parquet_path
+
+
+def engineered_parquet_is_current(data_path, parquet_path, feature_params=None):
+    """
+    True if parquet_path exists, is newer than the CSV and was written by the
+    current preprocessing pipeline with the same feature parameters.
+    """
+    import pyarrow.parquet as pq
+
+    if not os.path.exists(parquet_path) or os.path.getmtime(parquet_path) < os.path.getmtime(data_path):
+        return False
+    metadata = pq.read_schema(parquet_path).metadata or {}
+    return (metadata.get(PIPELINE_METADATA_KEY) == str(PIPELINE_VERSION).encode()
+            and metadata.get(FEATURE_PARAMS_METADATA_KEY) == _feature_params_signature(feature_params))
+
+
+class DuckDBView:
+    """
+    Queries over the rows matching one FilterState, pushed down as SQL.
+    """
+
+    def __init__(self, backend, state):
+        self.backend = backend
+        # A cursor is an independent connection to the same database, so
+        # concurrent sessions never share one.
+        self.con = backend.con.cursor()
+        self.where, self.params = self._where_clause(state)
+
+    @staticmethod
+    def _where_clause(state):
+        clauses, params = [], []
+        for col, selected in state.categorical():
+            if selected is None:
+                continue
+            if len(selected) == 0:
+                clauses.append('FALSE')
+                continue
+            clauses.append(f"{_quote(col)} IN ({', '.join('?' * len(selected))})")
+            params.extend(str(value) for value in selected)
+        for col, low, high in state.ranges:
+            if low is not None:
+                clauses.append(f'{_quote(col)} >= ?')
+                params.append(low)
+            if high is not None:
+                clauses.append(f'{_quote(col)} <= ?')
+                params.append(high)
+        return ' AND '.join(clauses) or 'TRUE', params
+
+    def _query(self, sql, params=()):
+        return self.con.execute(sql, list(self.params) + list(params)).df()
+
+    def count(self):
+        return int(self._query(f'SELECT COUNT(*) AS n FROM injuries WHERE {self.where}')['n'].iloc[0])
+
+    def aggregate(self, by, measures, order_by=None, ascending=False, limit=None):
+        select = ', '.join(f'{SQL_FUNCS[func].format(_quote(col))} AS {_quote(name)}'
+                           for name, (col, func) in measures.items())
+        if by is None:
+            result = self._query(f'SELECT {select} FROM injuries WHERE {self.where}')
+            return result.iloc[0].astype('float64')
+
+        key = _quote(by)
+        order = f'{key} ASC'
+        if order_by is not None:
+            order = f"{_quote(order_by)} {'ASC' if ascending else 'DESC'} NULLS LAST, {key} ASC"
+        sql = (f'SELECT {key}, {select} FROM injuries WHERE {self.where} AND {key} IS NOT NULL '
+               f'GROUP BY {key} ORDER BY {order}')
+        if limit is not None:
+            sql += f' LIMIT {int(limit)}'
+        result = self._query(sql).set_index(by)
+        # Ordering and limit were already applied in SQL
+        return _finish_aggregate(result, measures, None, ascending, None)
+
+    def pivot_count(self, index, columns, value, top_n):
+        idx, col, val = _quote(index), _quote(columns), _quote(value)
+        sql = (f'WITH top AS (SELECT {idx} FROM injuries WHERE {self.where} AND {idx} IS NOT NULL '
+               f'GROUP BY {idx} ORDER BY COUNT({val}) DESC, {idx} ASC LIMIT {int(top_n)}) '
+               f'SELECT {idx}, {col}, COUNT({val}) AS n FROM injuries '
+               f'WHERE {self.where} AND {col} IS NOT NULL AND {idx} IN (SELECT {idx} FROM top) '
+               f'GROUP BY {idx}, {col}')
+        # The filter appears twice (top-N subquery and outer query)
+        return _pivot_long(self._query(sql, self.params), index, columns)
+
+    def _restore_dtypes(self, frame):
+        for col, labels in CATEGORICAL_COLUMNS.items():
+            if col in frame.columns:
+                frame[col] = pd.Categorical(frame[col], categories=labels, ordered=True)
+        return frame
+
+    def top_rows(self, order_col, n, columns):
+        select = ', '.join(_quote(c) for c in columns)
+        sql = (f'SELECT {select} FROM injuries WHERE {self.where} AND {_quote(order_col)} IS NOT NULL '
+               f'ORDER BY {_quote(order_col)} DESC, {ROW_ID} ASC LIMIT {int(n)}')
+        return self._restore_dtypes(self._query(sql))
+
+    def rows(self, columns=None, equals=None):
+        select = ', '.join(_quote(c) for c in (columns or self.backend.columns))
+        extra = ''.join(f' AND {_quote(col)} = ?' for col in (equals or {}))
+        sql = f'SELECT {select} FROM injuries WHERE {self.where}{extra} ORDER BY {ROW_ID}'
+        return self._restore_dtypes(self._query(sql, list((equals or {}).values())))
+
+    def distinct(self, column):
+        key = _quote(column)
+        sql = f'SELECT DISTINCT {key} AS v FROM injuries WHERE {self.where} AND {key} IS NOT NULL ORDER BY v'
+        return self._query(sql)['v'].tolist()
+
+    def sort_order(self, order_by, ascending=False, equals=None):
+        extra = ''.join(f' AND {_quote(col)} = ?' for col in (equals or {}))
+        sql = (f'SELECT {ROW_ID} FROM injuries WHERE {self.where}{extra} '
+               f"ORDER BY {_quote(order_by)} {'ASC' if ascending else 'DESC'} NULLS LAST, {ROW_ID}")
+        return self._query(sql, list((equals or {}).values()))[ROW_ID].to_numpy()
+
+    def fetch(self, row_ids, columns):
+        if len(row_ids) > FETCH_IN_LIST_ROWS:
+            ids = pd.DataFrame({'fetch_id': np.asarray(row_ids, dtype='int64'),
+                                'fetch_position': np.arange(len(row_ids))})
+            self.con.register('fetch_ids', ids)
+            try:
+                select = ', '.join(f'injuries.{_quote(c)}' for c in columns)
+                result = self.con.execute(f'SELECT {select} FROM injuries JOIN fetch_ids '
+                                          f'ON injuries.{ROW_ID} = fetch_ids.fetch_id ORDER BY fetch_position').df()
+            finally:
+                self.con.unregister('fetch_ids')
+            return self._restore_dtypes(result)
+
+        # Row ids already encode the filter; an IN list lets the scan skip row groups
+        row_ids = [int(row_id) for row_id in row_ids]
+        select = ', '.join(_quote(c) for c in columns)
+        placeholders = ', '.join('?' * len(row_ids)) or 'NULL'
+        sql = f'SELECT {ROW_ID}, {select} FROM injuries WHERE {ROW_ID} IN ({placeholders})'
+        result = self.con.execute(sql, row_ids).df().set_index(ROW_ID)
+        return self._restore_dtypes(result.loc[row_ids].reset_index(drop=True))
+
+
+# Hard links a DuckDB backend pins its Parquet file's contents with:
+# .<file name>.<pid>.<n>.snapshot
+SNAPSHOT_SUFFIX = '.snapshot'
+_snapshot_ids = itertools.count()
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+def _snapshot_parquet(parquet_path):
+    """
+    Hard link to the current contents of parquet_path, which stays valid
+    when the file is replaced (write_engineered_parquet renames a new file
+    into place). Snapshots left by processes that have exited are removed.
+    Falls back to parquet_path itself where links are not supported.
+    """
+    directory, name = os.path.split(os.path.abspath(parquet_path))
+    prefix = f'.{name}.'
+    for entry in os.listdir(directory):
+        if entry.startswith(prefix) and entry.endswith(SNAPSHOT_SUFFIX):
+            pid = entry[len(prefix):-len(SNAPSHOT_SUFFIX)].split('.')[0]
+            if pid.isdigit() and int(pid) != os.getpid() and not _process_alive(int(pid)):
+                _remove_snapshot(os.path.join(directory, entry))
+
+    snapshot_path = os.path.join(directory, f'{prefix}{os.getpid()}.{next(_snapshot_ids)}{SNAPSHOT_SUFFIX}')
+    try:
+        os.link(parquet_path, snapshot_path)
+    except OSError as e:
+        logger.warning("Cannot snapshot %s (%s); a replaced file will show through to open backends",
+                       parquet_path, e)
+        return parquet_path
+    return snapshot_path
+
+
+def _remove_snapshot(snapshot_path):
+    try:
+        os.remove(snapshot_path)
+    except OSError:
+        pass
+
+
+def _close_backend(con, snapshot_path, parquet_path):
+    con.close()
+    if snapshot_path != parquet_path:
+        _remove_snapshot(snapshot_path)
+
+
+class DuckDBBackend:
+    """
+    Optional backend: an in-process DuckDB database over an engineered Parquet file.
+
+    The backend reads a snapshot (hard link) of the file taken when it was
+    opened, so one version of a dataset keeps its rows while a newer version
+    is written to the same path; the snapshot is removed with the backend.
+    """
+    name = 'duckdb'
+
+    def __init__(self, parquet_path):
+        import duckdb
+
+        self.parquet_path = parquet_path
+        self.snapshot_path = _snapshot_parquet(parquet_path)
+        self.con = duckdb.connect()
+        weakref.finalize(self, _close_backend, self.con, self.snapshot_path, parquet_path)
+        source = f"'{self.snapshot_path.replace(chr(39), chr(39) * 2)}'"
+        if ROW_ID in self.con.execute(f'SELECT * FROM read_parquet({source}) LIMIT 0').df().columns:
+            self.con.execute(f'CREATE VIEW injuries AS SELECT * FROM read_parquet({source})')
+        else:
+            # Parquet files from elsewhere (e.g. an injury_cli.py export) have no
+            # row id; number their rows in file order instead
+            self.con.execute(f'CREATE VIEW injuries AS SELECT * EXCLUDE (file_row_number), '
+                             f'file_row_number AS {ROW_ID} FROM read_parquet({source}, file_row_number = true)')
+        schema = self.con.execute('SELECT * FROM injuries LIMIT 0').df()
+        self.columns = [col for col in schema.columns if col != ROW_ID]
+        self.quality_report = self._read_quality_report(self.snapshot_path)
+
+    @staticmethod
+    def _read_quality_report(parquet_path):
+        """
+        The report stored by write_engineered_parquet; None for Parquet files
+        from elsewhere.
+        """
+        import pyarrow.parquet as pq
+
+        report = (pq.read_schema(parquet_path).metadata or {}).get(QUALITY_METADATA_KEY)
+        return QualityReport.from_json(report.decode()) if report is not None else None
+
+    def view(self, state):
+        return DuckDBView(self, state)
+
+    @property
+    def nbytes(self):
+        """
+        Memory held by DuckDB's buffer manager; the rows stay on disk.
+        """
+        return int(self.con.cursor().execute(
+            'SELECT COALESCE(SUM(memory_usage_bytes), 0) FROM duckdb_memory()'
+        ).fetchone()[0])
+
+    def options(self, column):
+        key = _quote(column)
+        return self.con.cursor().execute(
+            f'SELECT DISTINCT {key} AS v FROM injuries WHERE {key} IS NOT NULL ORDER BY v'
+        ).df()['v'].tolist()
+
+    def extent(self, column):
+        key = _quote(column)
+        low, high = self.con.cursor().execute(f'SELECT MIN({key}), MAX({key}) FROM injuries').fetchone()
+        if low is None:
+            return None
+        return low, high
+
+
+def default_parquet_path(data_path):
+    return os.path.splitext(data_path)[0] + '.engineered.parquet'
+
+
+def open_backend(name, data_path, parquet_path=None, known_teams=KNOWN_CLUBS, quality_thresholds=None, workers=1,
+                 feature_params=None, feature_cache=None):
+    """
+    Create the configured backend for a dataset.
+
+    For DuckDB, an existing parquet_path (e.g. a large on-disk history) is
+    queried directly; otherwise the CSV is engineered once and written next to
+    it, and rewritten whenever the CSV or the pipeline is newer.
+
+    The CSV is validated while it is parsed (data_quality.py); a file over the
+    quality thresholds raises DataQualityError instead of being served. The
+    backend's quality_report holds the findings. With workers > 1 the CSV is
+    preprocessed in partitions on that many cores (parallel_preprocess.py).
+    feature_params and feature_cache are passed to the feature DAG (see
+    injury_data.load_and_preprocess).
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend '{name}'. Choose from: {', '.join(BACKENDS)}")
+
+    def load():
+        if workers > 1:
+            return load_and_preprocess_parallel(data_path, workers, known_teams, quality_thresholds, with_report=True,
+                                                feature_params=feature_params, feature_cache=feature_cache)
+        return load_and_preprocess(data_path, known_teams, quality_thresholds, with_report=True,
+                                   feature_params=feature_params, feature_cache=feature_cache)
+
+    if name == 'pandas':
+        df, quality_report = load()
+        return PandasBackend(df, quality_report=quality_report)
+
+    if parquet_path is None:
+        parquet_path = default_parquet_path(data_path)
+        if not engineered_parquet_is_current(data_path, parquet_path, feature_params):
+            df, quality_report = load()
+            write_engineered_parquet(df, parquet_path, quality_report, feature_params)
+    return DuckDBBackend(parquet_path)
+
+
+# ============================================================================
+# PARITY CHECK
+# ============================================================================
+def default_filter_state(backend):
+    """
+    The sidebar's initial state: every option of each categorical filter selected.
+    """
+    return FilterState(
+        teams=tuple(backend.options('Team Name')),
+        seasons=tuple(backend.options('Season')),
+        severities=tuple(SEVERITY_LEVELS),
+        positions=tuple(backend.options('Position')),
+        age_groups=tuple(backend.options('Age_Group')),
+    )
+
+
+def dashboard_aggregates(view, approximate=False):
+    """
+    Every aggregate the dashboard shows for one filter state, keyed by name.
+
+    Results are small (bounded by the number of groups, not rows), which makes
+    them cheap to cache per filter state and to warm ahead of time. With
+    approximate=True the exact distinct counts are skipped; the sketches in
+    sketches.py estimate them instead.
+    """
+    distinct = {} if approximate else {'players': ('Name', 'nunique'), 'teams': ('Team Name', 'nunique')}
+    return {
+        'count': view.count(),
+        'summary': view.aggregate(None, {
+            **distinct,
+            'avg_duration': ('Injury_Duration_Days', 'mean'),
+            'std_duration': ('Injury_Duration_Days', 'std'),
+            'avg_perf_drop': ('Performance_Drop_Index', 'mean'),
+            'avg_team_drop': ('Team_Performance_Drop', 'mean'),
+            'avg_adj_team_drop': ('Adj_Team_Performance_Drop', 'mean'),
+            'avg_adj_gd_before': ('Adj_GD_Before', 'mean'),
+            'avg_adj_gd_during': ('Adj_GD_During', 'mean'),
+            'wins_before': ('Win_Ratio_Before', 'sum'),
+            'wins_during': ('Win_Ratio_During', 'sum'),
+            'avg_wins_before': ('Win_Ratio_Before', 'mean'),
+            'avg_wins_during': ('Win_Ratio_During', 'mean'),
+        }),
+        'injury_impact': view.aggregate('Injury', {
+            'Team_Performance_Drop': ('Team_Performance_Drop', 'mean'),
+            'Injury_Duration_Days': ('Injury_Duration_Days', 'mean'),
+            'Name': ('Name', 'count'),
+        }, order_by='Team_Performance_Drop', limit=10),
+        'injury_impact_adjusted': view.aggregate('Injury', {
+            'Team_Performance_Drop': ('Adj_Team_Performance_Drop', 'mean'),
+            'Injury_Duration_Days': ('Injury_Duration_Days', 'mean'),
+            'Name': ('Name', 'count'),
+        }, order_by='Team_Performance_Drop', limit=10),
+        'injury_counts': view.aggregate('Injury', {'Cases': ('Name', 'count')}, order_by='Cases', limit=1)['Cases'],
+        'clubs': view.aggregate('Team Name', {
+            'Name': ('Name', 'count'),
+            'Team_Impact_Severity': ('Team_Impact_Severity', 'mean'),
+        }, order_by='Name', limit=10),
+        'team_drop': view.aggregate('Team Name', {
+            'Team_Performance_Drop': ('Team_Performance_Drop', 'mean'),
+        }, order_by='Team_Performance_Drop', limit=10)['Team_Performance_Drop'],
+        'team_drop_adjusted': view.aggregate('Team Name', {
+            'Team_Performance_Drop': ('Adj_Team_Performance_Drop', 'mean'),
+        }, order_by='Team_Performance_Drop', limit=10)['Team_Performance_Drop'],
+        'players': view.aggregate('Name', {'Injuries': ('Name', 'count')}, order_by='Injuries', limit=15)['Injuries'],
+        'months': view.aggregate('Injury_Month_Name', {'Cases': ('Name', 'count')})['Cases'],
+        'seasons': view.aggregate('Season', {
+            'Cases': ('Name', 'count'),
+            'Injury_Duration_Days': ('Injury_Duration_Days', 'mean'),
+        }),
+        'severity': view.aggregate('Injury_Severity', {'Cases': ('Name', 'count')}, order_by='Cases')['Cases'],
+        'heatmap': view.pivot_count('Team Name', 'Injury_Month_Name', 'Name', top_n=10),
+        'comebacks': view.top_rows(
+            'Performance_Drop_Index', 10,
+            ['Name', 'Team Name', 'Injury', 'Performance_Drop_Index', 'Injury_Duration_Days', 'Age']
+        ),
+        'player_list': view.distinct('Name'),
+    }
+
+
+def dashboard_queries(view):
+    """
+    dashboard_aggregates plus a projected row slice and a sorted page, for
+    backend comparison.
+    """
+    results = dashboard_aggregates(view)
+    results['rows'] = view.rows(['Name', 'Team Name', 'Age_Group', 'Date of Injury', 'Injury_Duration_Days'])
+    for order_by, ascending in (('Performance_Drop_Index', False), ('Date of Injury', True), ('Name', False)):
+        order = view.sort_order(order_by, ascending)
+        results[f'page:{order_by}'] = view.fetch(order[20:40], list(dict.fromkeys(['Name', 'Injury', order_by])))
+    return results
+
+
+def compare_backends(left, right, states):
+    """
+    Run dashboard_queries on two backends for each FilterState and return a
+    list of mismatch descriptions (empty when the backends agree).
+    """
+    mismatches = []
+    for state in states:
+        left_results = dashboard_queries(left.view(state))
+        right_results = dashboard_queries(right.view(state))
+        for name, expected in left_results.items():
+            actual = right_results[name]
+            try:
+                if isinstance(expected, pd.DataFrame):
+                    pd.testing.assert_frame_equal(expected, actual, check_dtype=False, check_names=False,
+                                                  check_index_type=False, check_column_type=False)
+                elif isinstance(expected, pd.Series):
+                    pd.testing.assert_series_equal(expected, actual, check_dtype=False, check_names=False)
+                elif expected != actual:
+                    raise AssertionError(f"{expected!r} != {actual!r}")
+            except AssertionError as e:
+                mismatches.append(f"{state}: {name}: {e}")
+    return mismatches
@@ -0,0 +1,36 @@
+"""
+Launch the Football Injury Impact Dashboard with warm caches.
+
+Equivalent to ``streamlit run app.py [options]``, but starts the background
+cache warmer inside the server process before it accepts connections, so the
+engineered dataset and the most requested filter states are computed while
+the server boots rather than by the first analyst.
+
+Usage:
+    python serve.py
+    python serve.py --server.port 8502
+"""
+
+import os
+import sys
+
+from streamlit.web import cli as stcli
+
+import data_cache
+from parallel_preprocess import start_worker_pool
+
+APP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+
+
+def main():
+    if data_cache.PREPROCESS_WORKERS > 1:
+        # Workers are forked, so the pool starts before the warmer or any
+        # server thread does
+        start_worker_pool(data_cache.PREPROCESS_WORKERS)
+    data_cache.start_warmer()
+    sys.argv = ['streamlit', 'run', APP_FILE] + sys.argv[1:]
+    sys.exit(stcli.main())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,352 @@
+"""
+Mergeable summary sketches for the approximate statistics mode.
+
+- QuantileSketch: deterministic compactor sketch (KLL-style levels) with an
+  exact, tracked bound on the rank error of every quantile it returns.
+- HyperLogLog: distinct counts in 2^p one-byte registers, relative standard
+  error 1.04 / sqrt(2^p).
+- CoMoments: streaming count/mean/co-moment accumulators (Chan et al.), from
+  which means, standard deviations and the correlation matrix follow exactly.
+
+All three merge, so a sketch per data partition can be built once and any
+union of partitions answered by merging, without rescanning rows.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Columns summarised by the Advanced Statistics tab and the sidebar
+QUANTILE_COLUMNS = ['Age', 'FIFA rating', 'Injury_Duration_Days', 'Performance_Drop_Index', 'Team_Performance_Drop']
+MOMENT_COLUMNS = ['Age', 'FIFA rating', 'Injury_Duration_Days', 'Performance_Drop_Index',
+                  'Team_Performance_Drop', 'Win_Ratio_Before', 'Win_Ratio_During']
+DISTINCT_COLUMNS = ['Name', 'Team Name']
+
+# Sketches are prebuilt per combination of the sidebar's categorical filters
+PARTITION_COLUMNS = ['Team Name', 'Season', 'Injury_Severity', 'Position', 'Age_Group']
+
+# Every column a SketchBundle or PartitionedSketches reads
+SKETCH_COLUMNS = list(dict.fromkeys(PARTITION_COLUMNS + DISTINCT_COLUMNS + MOMENT_COLUMNS + QUANTILE_COLUMNS))
+
+
+# ============================================================================
+# QUANTILES
+# ============================================================================
+class QuantileSketch:
+    """
+    Levels of buffers where an item at level h stands for 2^h inputs. A full
+    buffer is sorted and every other item promoted to the next level; each
+    such compaction shifts any rank by at most 2^h, which is added to
+    rank_error, so quantile answers are within rank_error / n of exact.
+    The column's exact mean and sum of squared deviations ride along.
+    """
+
+    def __init__(self, k=1024):
+        self.k = k
+        self.n = 0
+        self.rank_error = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.levels = [np.empty(0)]
+        self._offsets = [0]
+
+    def update(self, values):
+        values = np.asarray(values, dtype='float64')
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        self._combine_moments(len(values), values.mean(), np.sum((values - values.mean()) ** 2))
+        self.n += len(values)
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other):
+        for h, buffer in enumerate(other.levels):
+            self._ensure_level(h)
+            self.levels[h] = np.concatenate([self.levels[h], buffer])
+        self._combine_moments(other.n, other.mean, other.m2)
+        self.n += other.n
+        self.rank_error += other.rank_error
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def _combine_moments(self, n_other, mean_other, m2_other):
+        if n_other == 0:
+            return
+        total = self.n + n_other
+        delta = mean_other - self.mean
+        self.m2 += m2_other + delta ** 2 * self.n * n_other / total
+        self.mean += delta * n_other / total
+
+    @property
+    def std(self):
+        return np.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else np.nan
+
+    def _ensure_level(self, h):
+        while len(self.levels) <= h:
+            self.levels.append(np.empty(0))
+            self._offsets.append(0)
+
+    def _compress(self):
+        h = 0
+        while h < len(self.levels):
+            if len(self.levels[h]) > self.k:
+                buffer = np.sort(self.levels[h])
+                keep = buffer[len(buffer) - len(buffer) % 2:]
+                buffer = buffer[:len(buffer) - len(keep)]
+                # Alternate which half survives so errors do not drift one way
+                promoted = buffer[self._offsets[h]::2]
+                self._offsets[h] ^= 1
+                self.levels[h] = keep
+                self._ensure_level(h + 1)
+                self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+                self.rank_error += 2 ** h
+            h += 1
+
+    def _value_at_rank(self, rank):
+        """
+        Value of the 0-based order statistic at rank, as the sketch sees it.
+        """
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(buffer), 2 ** h) for h, buffer in enumerate(self.levels)])
+        order = np.argsort(values, kind='stable')
+        cumulative = np.cumsum(weights[order])
+        position = np.searchsorted(cumulative, np.asarray(rank) + 1, side='left')
+        return values[order][np.minimum(position, len(values) - 1)]
+
+    def quantile(self, q):
+        """
+        Linearly interpolated q-quantile, as in pandas' describe().
+        """
+        if self.n == 0:
+            return np.nan
+        rank = np.clip(q, 0.0, 1.0) * (self.n - 1)
+        low, high = self._value_at_rank([np.floor(rank), np.ceil(rank)])
+        return low + (high - low) * (rank - np.floor(rank))
+
+    @property
+    def epsilon(self):
+        """
+        Normalised rank error bound: answers lie within ±epsilon quantiles of exact.
+        """
+        return self.rank_error / self.n if self.n else 0.0
+
+    def quantile_interval(self, q):
+        """
+        Values bracketing the exact q-quantile, from the sketch's error bound.
+        """
+        if self.n == 0:
+            return np.nan, np.nan
+        if self.rank_error == 0:
+            # Nothing compacted yet: the sketch still holds every value
+            return self.quantile(q), self.quantile(q)
+        rank = np.clip(q, 0.0, 1.0) * (self.n - 1)
+        low = max(np.floor(rank) - self.rank_error, 0)
+        high = min(np.ceil(rank) + self.rank_error, self.n - 1)
+        return tuple(self._value_at_rank([low, high]))
+
+
+# ============================================================================
+# DISTINCT COUNTS
+# ============================================================================
+class HyperLogLog:
+    """
+    HyperLogLog distinct counter over 64-bit pandas hashes.
+    """
+
+    def __init__(self, p=12):
+        self.p = p
+        self.m = 1 << p
+        self.registers = np.zeros(self.m, dtype='uint8')
+
+    def update(self, values):
+        values = pd.Series(values).dropna()
+        if len(values) == 0:
+            return self
+        hashes = pd.util.hash_pandas_object(values, index=False).to_numpy(dtype='uint64')
+        index = (hashes >> np.uint64(64 - self.p)).astype('int64')
+        remainder = hashes << np.uint64(self.p)
+
+        # Vectorised count of leading zeros in the remaining 64 - p bits
+        leading = np.zeros(len(remainder), dtype='int64')
+        for shift in (32, 16, 8, 4, 2, 1):
+            empty = remainder < (np.uint64(1) << np.uint64(64 - shift))
+            leading[empty] += shift
+            remainder[empty] <<= np.uint64(shift)
+        rank = np.minimum(leading + 1, 64 - self.p + 1).astype('uint8')
+
+        np.maximum.at(self.registers, index, rank)
+        return self
+
+    def merge(self, other):
+        self.registers = np.maximum(self.registers, other.registers)
+        return self
+
+    def estimate(self):
+        if not self.registers.any():
+            return 0.0
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        raw = alpha * self.m ** 2 / np.sum(np.exp2(-self.registers.astype('float64')))
+        zeros = np.count_nonzero(self.registers == 0)
+        if raw <= 2.5 * self.m and zeros > 0:
+            # Linear counting is more accurate for small cardinalities
+            return self.m * np.log(self.m / zeros)
+        return raw
+
+    @property
+    def relative_error(self):
+        """
+        Two standard errors (about 95% confidence), as a fraction of the estimate.
+        """
+        return 2 * 1.04 / np.sqrt(self.m)
+
+    def bound(self):
+        return self.estimate() * self.relative_error
+
+
+# ============================================================================
+# MOMENTS & CORRELATION
+# ============================================================================
+class CoMoments:
+    """
+    Count, mean vector and co-moment matrix of several columns, updated in
+    chunks and merged with the pairwise formulas of Chan, Golub and LeVeque.
+    Rows with a missing value in any column are skipped.
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        p = len(self.columns)
+        self.n = 0
+        self.mean = np.zeros(p)
+        self.comoment = np.zeros((p, p))
+
+    def update(self, matrix):
+        matrix = np.asarray(matrix, dtype='float64')
+        matrix = matrix[~np.isnan(matrix).any(axis=1)]
+        if len(matrix) == 0:
+            return self
+        chunk_mean = matrix.mean(axis=0)
+        deviations = matrix - chunk_mean
+        return self._combine(len(matrix), chunk_mean, deviations.T @ deviations)
+
+    def merge(self, other):
+        return self._combine(other.n, other.mean, other.comoment)
+
+    def _combine(self, n_other, mean_other, comoment_other):
+        if n_other == 0:
+            return self
+        total = self.n + n_other
+        delta = mean_other - self.mean
+        self.comoment = self.comoment + comoment_other + np.outer(delta, delta) * self.n * n_other / total
+        self.mean = self.mean + delta * n_other / total
+        self.n = total
+        return self
+
+    def std(self):
+        if self.n < 2:
+            return pd.Series(np.nan, index=self.columns)
+        return pd.Series(np.sqrt(np.diag(self.comoment) / (self.n - 1)), index=self.columns)
+
+    def corr(self):
+        scale = np.sqrt(np.diag(self.comoment))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = self.comoment / np.outer(scale, scale)
+        return pd.DataFrame(corr, index=self.columns, columns=self.columns)
+
+
+# ============================================================================
+# BUNDLES & PARTITIONS
+# ============================================================================
+class SketchBundle:
+    """
+    Every sketch the approximate statistics mode needs for one set of rows.
+    """
+
+    def __init__(self):
+        self.quantiles = {col: QuantileSketch() for col in QUANTILE_COLUMNS}
+        self.distinct = {col: HyperLogLog() for col in DISTINCT_COLUMNS}
+        self.moments = CoMoments(MOMENT_COLUMNS)
+
+    @classmethod
+    def from_frame(cls, frame):
+        bundle = cls()
+        for col, sketch in bundle.quantiles.items():
+            sketch.update(frame[col].to_numpy(dtype='float64', na_value=np.nan))
+        for col, sketch in bundle.distinct.items():
+            sketch.update(frame[col])
+        bundle.moments.update(frame[MOMENT_COLUMNS].to_numpy(dtype='float64', na_value=np.nan))
+        return bundle
+
+    @classmethod
+    def merged(cls, bundles):
+        result = cls()
+        for bundle in bundles:
+            for col, sketch in bundle.quantiles.items():
+                result.quantiles[col].merge(sketch)
+            for col, sketch in bundle.distinct.items():
+                result.distinct[col].merge(sketch)
+            result.moments.merge(bundle.moments)
+        return result
+
+    def describe(self):
+        """
+        A describe()-shaped summary and a same-shaped table of error bounds
+        (half-widths; zero where the statistic is exact).
+        """
+        summary, bounds = {}, {}
+        for col, sketch in self.quantiles.items():
+            stats = {'count': sketch.n, 'mean': sketch.mean if sketch.n else np.nan, 'std': sketch.std,
+                     'min': sketch.min if sketch.n else np.nan}
+            errors = {'count': 0.0, 'mean': 0.0, 'std': 0.0, 'min': 0.0}
+            for label, q in (('25%', 0.25), ('50%', 0.5), ('75%', 0.75)):
+                low, high = sketch.quantile_interval(q)
+                stats[label] = sketch.quantile(q)
+                errors[label] = max(stats[label] - low, high - stats[label])
+            stats['max'], errors['max'] = (sketch.max if sketch.n else np.nan), 0.0
+            summary[col], bounds[col] = stats, errors
+        return pd.DataFrame(summary), pd.DataFrame(bounds)
+
+    def statistics(self):
+        """
+        Everything the dashboard shows in approximate mode, as plain values:
+        distinct counts as (estimate, ± bound), the correlation matrix, and
+        the describe() table with its bounds.
+        """
+        summary, bounds = self.describe()
+        return {
+            'players': (self.distinct['Name'].estimate(), self.distinct['Name'].bound()),
+            'teams': (self.distinct['Team Name'].estimate(), self.distinct['Team Name'].bound()),
+            'corr': self.moments.corr(),
+            'describe': summary,
+            'bounds': bounds,
+        }
+
+
+class PartitionedSketches:
+    """
+    One SketchBundle per combination of PARTITION_COLUMNS, built in a single
+    pass; a categorical filter selection is answered by merging the bundles
+    of the matching partitions.
+    """
+
+    def __init__(self, frame):
+        self.keys = []
+        self.bundles = []
+        for key, group in frame.groupby(PARTITION_COLUMNS, observed=True, dropna=False, sort=False):
+            self.keys.append(key)
+            self.bundles.append(SketchBundle.from_frame(group))
+        self.keys = pd.DataFrame(self.keys, columns=PARTITION_COLUMNS)
+
+    def select(self, state):
+        mask = np.ones(len(self.keys), dtype=bool)
+        for col, selected in state.categorical():
+            if selected is not None:
+                mask &= self.keys[col].isin(selected).to_numpy()
+        return SketchBundle.merged(bundle for bundle, keep in zip(self.bundles, mask) if keep)
@@ -0,0 +1,174 @@
+"""
+Background cache warm-up for the Football Injury Impact Dashboard.
+
+A CacheWarmer thread runs a warm-up cycle at startup and again whenever the
+data version changes (e.g. the source file is replaced). Which filter states
+to warm is learned from a UsageLog of the states analysts actually request.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+
+import numpy as np
+import pandas as pd
+
+from injury_data import FilterState
+
+logger = logging.getLogger(__name__)
+
+# Range columns whose bounds are timestamps
+DATE_RANGE_COLUMNS = {'Date of Injury'}
+
+
+# ============================================================================
+# FILTER STATE SERIALISATION
+# ============================================================================
+def _bound_to_json(value):
+    if value is None:
+        return None
+    if isinstance(value, np.datetime64) or hasattr(value, 'isoformat'):
+        return pd.Timestamp(value).isoformat()
+    return value.item() if hasattr(value, 'item') else value
+
+
+def filter_state_to_record(state):
+    record = {field: (list(value) if value is not None else None)
+              for field, value in state._asdict().items() if field != 'ranges'}
+    record['ranges'] = [[col, _bound_to_json(low), _bound_to_json(high)] for col, low, high in state.ranges]
+    return record
+
+
+def filter_state_from_record(record):
+    def bound(col, value):
+        if value is not None and col in DATE_RANGE_COLUMNS:
+            return pd.Timestamp(value)
+        return value
+
+    fields = {field: (tuple(value) if value is not None else None)
+              for field, value in record.items() if field != 'ranges'}
+    fields['ranges'] = tuple((col, bound(col, low), bound(col, high)) for col, low, high in record.get('ranges', []))
+    return FilterState(**fields)
+
+
+# ============================================================================
+# USAGE LOG
+# ============================================================================
+class UsageLog:
+    """
+    JSON-lines log of the filter states requested per dataset, holding about
+    the latest max_records records: once it grows a tenth past them, it is
+    trimmed back to max_records.
+    """
+
+    def __init__(self, path, max_records=10000):
+        self.path = path
+        self.max_records = max_records
+        self._lock = threading.Lock()
+        self._records = None
+        self._failing = False
+
+    def record(self, data_path, state):
+        """
+        Append one request. A log that cannot be written (read-only or full
+        disk) is skipped with a warning, so recording never breaks a page.
+        """
+        line = json.dumps({'ts': time.time(), 'data': data_path, 'state': filter_state_to_record(state)})
+        with self._lock:
+            try:
+                if self._records is None:
+                    self._records = self._count_records()
+                with open(self.path, 'a') as log:
+                    log.write(line + '\n')
+                self._records += 1
+                if self._records > self.max_records + self.max_records // 10:
+                    self._trim()
+                self._failing = False
+            except OSError as e:
+                if not self._failing:
+                    logger.warning("Not recording usage: cannot write %s (%s)", self.path, e)
+                self._failing = True
+
+    def _count_records(self):
+        if not os.path.exists(self.path):
+            return 0
+        with open(self.path) as log:
+            return sum(1 for _ in log)
+
+    def _trim(self):
+        with open(self.path) as log:
+            recent = deque(log, maxlen=self.max_records)
+        # Write then rename, so a crash mid-trim never loses the log
+        with open(self.path + '.tmp', 'w') as trimmed:
+            trimmed.writelines(recent)
+        os.replace(self.path + '.tmp', self.path)
+        self._records = len(recent)
+
+    def most_frequent(self, data_path, n):
+        """
+        The n most requested filter states for a dataset, among the latest records.
+        """
+        if n <= 0 or not os.path.exists(self.path):
+            return []
+        with self._lock:
+            try:
+                with open(self.path) as log:
+                    recent = deque(log, maxlen=self.max_records)
+            except OSError as e:
+                logger.warning("Cannot read the usage log %s: %s", self.path, e)
+                return []
+
+        counts = Counter()
+        for line in recent:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get('data') == data_path:
+                counts[json.dumps(entry['state'], sort_keys=True)] += 1
+        return [filter_state_from_record(json.loads(state)) for state, _ in counts.most_common(n)]
+
+
+# ============================================================================
+# WARMER THREAD
+# ============================================================================
+class CacheWarmer:
+    """
+    Daemon thread that calls warm_cycle(version) at startup and after every
+    change of version_fn(). ready_fn, when given, is polled before the first
+    cycle (e.g. until the Streamlit runtime that owns the caches exists).
+    """
+
+    def __init__(self, warm_cycle, version_fn, poll_seconds=30, ready_fn=None):
+        self.warm_cycle = warm_cycle
+        self.version_fn = version_fn
+        self.poll_seconds = poll_seconds
+        self.ready_fn = ready_fn
+        self.status = {'version': None, 'warmed_at': None, 'seconds': None, 'states': 0, 'error': None}
+        self._thread = threading.Thread(target=self._run, name='cache-warmer', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while self.ready_fn is not None and not self.ready_fn():
+            time.sleep(0.5)
+
+        while True:
+            try:
+                version = self.version_fn()
+                if version != self.status['version']:
+                    start = time.perf_counter()
+                    states = self.warm_cycle(version)
+                    self.status.update(version=version, warmed_at=time.time(),
+                                       seconds=time.perf_counter() - start, states=states, error=None)
+                    logger.info("Cache warm-up for version %s: %d filter states in %.2fs",
+                                version, states, self.status['seconds'])
+            except Exception as e:
+                self.status['error'] = str(e)
+                logger.exception("Cache warm-up failed")
+            time.sleep(self.poll_seconds)